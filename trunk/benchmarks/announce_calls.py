@@ -0,0 +1,79 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Repository calls per announced commit, for a burst of commits landing
+    between two polls. The old announcer asked for the last revision and
+    then the last log entry once per tick, bumping the revision by one;
+    SVNInterface.logSince fetches the whole new range in one call.
+
+    Usage: python benchmarks/announce_calls.py [commits]
+"""
+
+# system imports
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakesvn
+
+def old(svn, repo, last):
+    """The old announcer: one commit per tick, two log calls per tick"""
+    announced = []
+    ticks = 0
+    while last < repo.head:
+        ticks += 1
+        svn.lastLog(1)                      # lastRev() was a lastLog() round trip
+        last += 1
+        entry = svn.lastLog(1, True)[0]     # cmd_lastlog with no params
+        announced.append(int(entry['revision']))
+    return ticks, announced
+
+def new(svn, repo, last):
+    """One ranged log call from last to HEAD, every new commit in order"""
+    return 1, [int(entry['revision']) for entry in svn.logSince(last, True)]
+
+def main(commits=20):
+    for name, announcer in (('old', old), ('logSince', new)):
+        repo = fakesvn.install(100)
+        from modules.svn import SVNInterface
+        svn = SVNInterface('file:///bench')
+        last = repo.head
+        for i in range(commits):
+            repo.commit()
+
+        repo.calls = 0
+        ticks, announced = announcer(svn, repo, last)
+        right = announced == range(last + 1, repo.head + 1)
+        print '%-9s %2d commits: %3d calls (%.1f per commit) over %2d ticks, %2d distinct revisions announced, order %s' % (
+            name, commits, repo.calls, float(repo.calls) / commits, ticks,
+            len(set(announced)), right and 'right' or 'WRONG')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
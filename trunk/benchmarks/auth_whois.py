@@ -0,0 +1,120 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    WHOIS lines sent when the bot joins many channels with many authorised
+    users on them, before (one WHOIS per user per channel joined) and after
+    (AuthManager, deduplicated and coalesced), then again on rejoining while
+    the identifications are still trusted.  Also times the logged-in check
+    every message goes through, list against set.
+
+    Usage: python benchmarks/auth_whois.py [channels] [admins] [batch]
+"""
+
+# system imports
+import os
+import sys
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# twisted imports
+from twisted.internet import task
+
+# modules
+from modules import auth
+
+def oldJoin(channels, admins):
+    # as TehBot.joined and cmd_login did before: replies only come back
+    # after all the joins have gone out, so nobody is logged in yet
+    lines = []
+    loggedIn = []
+    authQ = []
+    for channel in channels:
+        for user in admins:
+            if user.lower() not in loggedIn:
+                authQ.append(user)
+                lines.append('WHOIS %s' % (user,))
+    return lines
+
+def newJoin(manager, clock, channels, admins):
+    for channel in channels:
+        for user in admins:
+            manager.request(user)
+    clock.advance(manager.delay)
+
+def answer(manager, lines):
+    # the server says everyone asked about is identified
+    for line in lines:
+        nicks = line.split(' ', 1)[1]
+        for nick in nicks.split(','):
+            manager.identify(nick)
+        manager.endOfWhois(nicks)
+
+def lookups(loggedIn, nicks):
+    start = time()
+    for nick in nicks:
+        nick in loggedIn
+    return len(nicks) / (time() - start)
+
+def main(channels=20, admins=50, batch=1):
+    clock = task.Clock()
+    auth.reactor = clock
+    auth.time = clock.seconds
+
+    channelList = ['#chan%d' % (i,) for i in range(channels)]
+    adminList = ['Admin%d' % (i,) for i in range(admins)]
+    old = oldJoin(channelList, adminList)
+
+    lines = []
+    manager = auth.AuthManager(lines.append, batch=batch)
+    newJoin(manager, clock, channelList, adminList)
+    first = len(lines)
+    answer(manager, lines)
+    loggedIn = len(manager.loggedIn)
+
+    # reconnect: everyone logged out, then the same joins again
+    for nick in list(manager.loggedIn):
+        manager.logout(nick)
+    del lines[:]
+    clock.advance(60)
+    newJoin(manager, clock, channelList, adminList)
+    again = len(lines)
+
+    nicks = [adminList[-1].lower()] * 200000
+    listRate = lookups([user.lower() for user in adminList], nicks)
+    setRate = lookups(set([user.lower() for user in adminList]), nicks)
+
+    print '%d channels, %d authorised users, %d nicks per WHOIS' % (channels, admins, batch)
+    print 'old              %6d WHOIS lines' % (len(old),)
+    print 'AuthManager      %6d WHOIS lines, %d logged in' % (first, loggedIn)
+    print 'rejoin           %6d WHOIS lines' % (again,)
+    print 'logged-in check  list %9.0f/s  set %9.0f/s' % (listRate, setRate)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
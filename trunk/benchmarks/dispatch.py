@@ -0,0 +1,133 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Messages per second through the command dispatch of TehBot.privmsg,
+    before (lists, lower() per check, getattr per message) and after
+    (CommandRegistry built once, sets for the access lists), with thousands
+    of authorised users and disabled commands.
+
+    Usage: python benchmarks/dispatch.py [users] [disabled] [messages]
+"""
+
+# system imports
+import os
+import random
+import sys
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# modules
+from modules.commands import buildRegistry, findCommand
+
+_names = ['help', 'stats', 'lastlog', 'google', 'more', 'topic', 'say', 'kick', 'op', 'deop',
+          'join', 'leave', 'hop', 'bark', 'insult', 'searchlog', 'userlog', 'watchrepo']
+_admin = ['disable', 'enable', 'open', 'close']
+
+class Bot:
+    """Just enough of TehBot: cmd_ handlers that do nothing"""
+    def reply(self, user, message):
+        pass
+
+def handler(self, user, channel, params):
+    pass
+
+for _name in _names + _admin + ['login', 'logout']:
+    setattr(Bot, 'cmd_' + _name, handler)
+
+Bot.registry = buildRegistry(Bot, _admin, {'commands': 'help'})
+
+def oldDispatch(bot, checkUser, command, params, loggedIn, openCommands, disabled, authors):
+    # as TehBot.privmsg did before the registry
+    if checkUser in loggedIn or command.lower() in openCommands:
+        if command.lower() == 'login':
+            bot.cmd_login(checkUser, '#chan', params)
+        elif command.lower() == 'logout':
+            bot.cmd_logout(checkUser, '#chan', params)
+        elif command.lower() in _admin and checkUser not in authors:
+            bot.reply(checkUser, 'ERROR: Administrator only command')
+        elif command.lower() in disabled and checkUser not in authors:
+            bot.reply(checkUser, 'ERROR: Disabled command')
+        else:
+            try:
+                h = getattr(bot, 'cmd_' + command.lower())
+            except AttributeError:
+                bot.reply(checkUser, 'Unrecognised command')
+            else:
+                h(checkUser, '#chan', params)
+
+class Options:
+    """The access lists of TehBot's options, as sets"""
+    def __init__(self, openCommands, disabled, authors):
+        self.openCommands = openCommands
+        self.disabledCommands = disabled
+        self.authors = authors
+
+def newDispatch(bot, checkUser, command, params, loggedIn, options):
+    # the lookup TehBot.privmsg uses, followed by its special cases
+    name, cmd, error = findCommand(bot.registry, command, checkUser, loggedIn, options)
+    if name is not None:
+        if error is not None:
+            bot.reply(checkUser, error)
+        elif name == 'login':
+            bot.cmd_login(checkUser, '#chan', params)
+        elif name == 'logout':
+            bot.cmd_logout(checkUser, '#chan', params)
+        else:
+            cmd.handler(bot, checkUser, '#chan', params)
+
+def run(dispatch, messages, *lists):
+    bot = Bot()
+    start = time()
+    for user, command, params in messages:
+        dispatch(bot, user, command, params, *lists)
+    return len(messages) / (time() - start)
+
+def main(users=5000, disabled=2000, count=50000):
+    random.seed(1)
+    userList = ['user%d' % (i,) for i in range(users)]
+    disabledList = ['nothing%d' % (i,) for i in range(disabled)] + ['bark']
+    openList = ['help', 'stats']
+    authorList = ['xor', 'iddqd']
+
+    # mostly users late in the list, the worst case for list scans
+    messages = []
+    for i in range(count):
+        user = userList[-1 - random.randrange(min(users, 100))]
+        command = random.choice(_names + _admin + ['Commands', 'nosuch'])
+        messages.append((user, command.upper(), ['a', 'b']))
+
+    old = run(oldDispatch, messages, userList, openList, disabledList, authorList)
+    new = run(newDispatch, messages, set(userList), Options(set(openList), set(disabledList), set(authorList)))
+    print '%d authorised users, %d disabled commands, %d messages' % (users, len(disabledList), count)
+    print 'lists + getattr  %9.0f messages/s' % (old,)
+    print 'registry + sets  %9.0f messages/s  (%.0fx)' % (new, new / old)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
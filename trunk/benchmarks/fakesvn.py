@@ -0,0 +1,125 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    A stand-in for pysvn used by the benchmarks: a repository held in
+    memory that answers log calls after a configurable delay and counts
+    them. install() makes `import pysvn` find this module instead, and
+    more repositories can be put in repositories by URL
+"""
+
+# system imports
+import sys
+import threading
+import time
+
+class ClientError(Exception):
+    pass
+
+class opt_revision_kind:
+    head = 'head'
+    number = 'number'
+
+class Revision:
+    def __init__(self, kind, number=None):
+        self.kind = kind
+        self.number = number
+
+class Repository:
+    """
+        Commits numbered from 1, each touching our path
+    """
+
+    def __init__(self, head=0, delay=0.0):
+        self.entries = {}       # revision -> log entry
+        self.head = 0
+        self.delay = delay      # seconds every log call takes
+        self.calls = 0          # log calls made
+        self.lock = threading.Lock()
+        for i in range(head):
+            self.commit()
+
+    def commit(self, message=None, author='bench', paths=('/trunk/bot.py',)):
+        self.head += 1
+        if message is None:
+            message = 'commit number %d\nwith a second line' % (self.head,)
+        self.entries[self.head] = {
+            'date': time.time(),
+            'revision': Revision(opt_revision_kind.number, self.head),
+            'author': author,
+            'message': message,
+            'changed_paths': [{'path': path, 'action': 'M'} for path in paths],
+        }
+        return self.head
+
+    def number(self, revision):
+        if revision.kind == opt_revision_kind.head:
+            return self.head
+        if revision.number > self.head:
+            raise ClientError('No such revision %d' % (revision.number,))
+        return revision.number
+
+    def log(self, start, end, files=False, limit=0):
+        self.lock.acquire()
+        try:
+            self.calls += 1
+        finally:
+            self.lock.release()
+        if self.delay:
+            time.sleep(self.delay)
+
+        start, end = self.number(start), self.number(end)
+        if start <= end:
+            revs = range(max(start, 1), end + 1)
+        else:
+            revs = range(start, max(end, 1) - 1, -1)
+        if limit:
+            revs = revs[:limit]
+
+        log = []
+        for rev in revs:
+            entry = dict(self.entries[rev])
+            if not files:
+                entry['changed_paths'] = []
+            log.append(entry)
+        return log
+
+repository = Repository()
+repositories = {}       # url -> Repository, anything else goes to repository
+
+class Client:
+    def log(self, url, revision_start=None, revision_end=None, discover_changed_paths=False, limit=0):
+        repo = repositories.get(url, repository)
+        return repo.log(revision_start, revision_end, discover_changed_paths, limit)
+
+def install(head=0, delay=0.0):
+    """Makes `import pysvn` find this module, with a new repository. Returns the repository"""
+    global repository
+    repository = Repository(head, delay)
+    sys.modules['pysvn'] = sys.modules[__name__]
+    return repository
@@ -0,0 +1,102 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Search result titles and snippets per second through htmlToText: the
+    sgmllib parser it used before, the single regexp pass on fresh strings,
+    and the regexp pass with the result cache hit (repeated searches).
+
+    Usage: python benchmarks/html_to_text.py [snippets] [rounds]
+"""
+
+# system imports
+import os
+import random
+import sys
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# modules
+from modules import utils
+
+_words = ['twisted', 'python', 'irc', 'bot', 'subversion', 'commit', 'reactor', 'deferred',
+          'protocol', 'factory', 'channel', 'server', 'release', 'download', 'manual']
+_markup = ['<b>%s</b>', '<i>%s</i>', '%s &amp; more', '&quot;%s&quot;', '%s&#39;s',
+           '%s&nbsp;...', '<a href="http://example.org/%s">link</a>', '%s<br>', '&lt;%s&gt;']
+
+def snippet(i):
+    words = []
+    for j in range(random.randint(10, 30)):
+        word = random.choice(_words)
+        if random.random() < 0.3:
+            word = random.choice(_markup) % (word,)
+        words.append(word)
+    # unique, so the cache never hits on the fresh runs
+    return '%s <b>%d</b>' % (' '.join(words), i)
+
+def oldHtmlToText(s, tagReplace=' '):
+    # as utils.htmlToText did before
+    x = utils.HtmlToText(tagReplace)
+    x.feed(s)
+    return x.getText()
+
+def run(convert, snippets, rounds):
+    start = time()
+    for i in range(rounds):
+        for s in snippets:
+            convert(s)
+    return len(snippets) * rounds / (time() - start)
+
+def main(count=2000, rounds=5):
+    random.seed(1)
+    snippets = [snippet(i) for i in range(count)]
+    differ = 0
+    for s in snippets:
+        if oldHtmlToText(s) != utils.htmlToText(s):
+            differ += 1
+
+    old = run(oldHtmlToText, snippets, rounds)
+    fresh = []
+    for i in range(rounds):
+        fresh.append(['%s %d' % (s, i) for s in snippets])
+    start = time()
+    for batch in fresh:
+        for s in batch:
+            utils.htmlToText(s)
+    new = len(snippets) * rounds / (time() - start)
+    repeat = snippets[:256]
+    cached = run(utils.htmlToText, repeat, rounds * count / len(repeat))
+
+    print '%d snippets x %d rounds, %d converted differently' % (count, rounds, differ)
+    print 'sgmllib          %9.0f snippets/s' % (old,)
+    print 'regexp           %9.0f snippets/s  (%.0fx)' % (new, new / old)
+    print 'regexp, cached   %9.0f snippets/s  (%.0fx)' % (cached, cached / old)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
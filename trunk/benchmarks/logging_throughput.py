@@ -0,0 +1,102 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Log throughput in lines per second, and writes to the file, for the
+    old logger (strftime and a flush for every line) and MessageLogger,
+    which buffers lines, caches the timestamp and writes in batches.
+
+    Usage: python benchmarks/logging_throughput.py [lines]
+"""
+
+# system imports
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# modules
+from modules.logging import MessageLogger
+
+class CountingFile:
+    """A file counting the writes that reach it (and any file after it, if rotated)"""
+    writes = 0
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        CountingFile.writes += 1
+        self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+class CountingLogger(MessageLogger):
+    def rotate(self):
+        MessageLogger.rotate(self)
+        self.file = CountingFile(self.file)
+
+class OldLogger:
+    """MessageLogger as it was"""
+    def __init__(self, file):
+        self.file = file
+
+    def log(self, message):
+        timestamp = time.strftime("[%H:%M:%S]", time.localtime(time.time()))
+        self.file.write('%s %s\n' % (timestamp, message))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def run(logger, lines):
+    CountingFile.writes = 0
+    start = time.time()
+    for i in xrange(lines):
+        logger.log('someone (#pychat): line %d of a busy channel, with a bit of text' % (i,))
+    logger.close()
+    return lines / (time.time() - start), CountingFile.writes
+
+def main(lines=200000):
+    directory = tempfile.mkdtemp()
+    try:
+        old, oldWrites = run(OldLogger(CountingFile(open(os.path.join(directory, 'old.log'), 'a'))), lines)
+        new, newWrites = run(CountingLogger(directory), lines)
+    finally:
+        shutil.rmtree(directory)
+
+    print '%d lines' % (lines,)
+    print 'flush per line  %9.0f lines/s  %7d writes' % (old, oldWrites)
+    print 'MessageLogger   %9.0f lines/s  %7d writes' % (new, newWrites)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,129 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    SEARCHLOG over a synthetic corpus: builds a LogStore of lines spread
+    over channels and days, then times indexed searches against scanning
+    the raw logs for the same terms (what grepping them by hand does).
+
+    Usage: python benchmarks/logstore_search.py [lines] [channels] [days]
+"""
+
+# system imports
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# modules
+from modules.logstore import LogStore, tokenize
+
+def vocabulary(size=20000):
+    """Words with a few very common and many rare ones, roughly like chat"""
+    random.seed(1)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = []
+    for i in range(size):
+        words.append(''.join([random.choice(letters) for j in range(random.randint(2, 9))]))
+    return words
+
+def build(store, lines, channels, days, words, nicks):
+    start = time.time()
+    first = time.mktime((2008, 1, 1, 0, 0, 0, 0, 0, -1))
+    perDay = lines / (channels * days)
+    count = 0
+    for day in range(days):
+        for i in range(perDay):
+            when = first + day * 86400 + i * 86400 / perDay
+            for channel in range(channels):
+                # zipf-ish: index by a squared random picks the first words far more often
+                text = ' '.join([words[int(len(words) * random.random() ** 3)] for j in range(random.randint(3, 15))])
+                store.add('#chan%d' % (channel,), random.choice(nicks), 'msg', text, when)
+                count += 1
+            if count % 20000 < channels:
+                store.flush()
+    store.close()
+    return count, time.time() - start
+
+def scan(directory, terms, nick, limit=5):
+    """Reads every raw log, as grep would, for records with all terms (and nick)"""
+    results = []
+    for channel in os.listdir(directory):
+        path = os.path.join(directory, channel)
+        for name in os.listdir(path):
+            if not name.endswith('.log'):
+                continue
+            f = open(os.path.join(path, name), 'rb')
+            for line in f:
+                fields = line.rstrip('\n').split('\t', 4)
+                if nick and fields[2] != nick:
+                    continue
+                words = tokenize(fields[4])
+                for term in terms:
+                    if term not in words:
+                        break
+                else:
+                    results.append(line)
+            f.close()
+    return results[:limit]
+
+def main(lines=1000000, channels=10, days=30):
+    words = vocabulary()
+    nicks = ['nick%d' % (i,) for i in range(200)]
+    directory = tempfile.mkdtemp()
+    try:
+        store = LogStore(directory)
+        count, seconds = build(store, lines, channels, days, words, nicks)
+        print 'built %d records over %d channels and %d days in %.1fs' % (count, channels, days, seconds)
+
+        queries = [
+            ([words[0]], None),                 # very common
+            ([words[50], words[3000]], None),   # less common pair
+            ([words[15000]], None),             # rare
+            ([words[1]], 'nick7'),              # by nick
+            (['nosuchword'], None),             # no hits
+        ]
+        store = LogStore(directory)
+        for terms, nick in queries:
+            start = time.time()
+            hits = store.search(terms, None, nick)
+            indexed = time.time() - start
+            start = time.time()
+            scan(directory, terms, nick)
+            scanned = time.time() - start
+            print '%-28s %d hits  index %8.1fms  scan %8.1fms' % (
+                ' '.join(terms) + (nick and ' nick:' + nick or ''), len(hits), indexed * 1000, scanned * 1000)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
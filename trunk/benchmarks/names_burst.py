@@ -0,0 +1,133 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Replays a large NAMES burst (RPL_NAMREPLY lines for channels sharing a
+    big pool of nicks) into Membership, then a stream of joins, parts and
+    quits.  Reports lines per second and resident memory, against keeping
+    a plain set of lower cased nicks per channel.
+
+    Usage: python benchmarks/names_burst.py [channels] [nicks] [per channel]
+"""
+
+# system imports
+import os
+import random
+import sys
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# modules
+from modules.membership import Membership
+from memory import rss, inChild
+
+def burst(channels, pool, perChannel):
+    """(channel, line) for every RPL_NAMREPLY, about 400 bytes each like a server sends"""
+    lines = []
+    for channel in channels:
+        names = []
+        for nick in random.sample(pool, perChannel):
+            if random.random() < 0.05:
+                nick = random.choice('@+') + nick
+            names.append(nick)
+            if len(names) == 40:
+                lines.append((channel, ' '.join(names)))
+                names = []
+        if names:
+            lines.append((channel, ' '.join(names)))
+    return lines
+
+class Plain:
+    """Sets of lower cased nicks, no case mapping, interning or reverse index"""
+    def __init__(self):
+        self.channels = {}
+        self.names = {}
+
+    def namesReply(self, channel, names):
+        self.names.setdefault(channel.lower(), []).extend([name.lstrip('@+').lower()
+                                                            for name in names.split()])
+
+    def endOfNames(self, channel):
+        self.channels[channel.lower()] = set(self.names.pop(channel.lower(), []))
+
+    def quit(self, nick):
+        # no reverse index, so look everywhere
+        nick = nick.lower()
+        for members in self.channels.itervalues():
+            members.discard(nick)
+
+    def add(self, channel, nick):
+        self.channels[channel.lower()].add(nick.lower())
+
+    def remove(self, channel, nick):
+        self.channels[channel.lower()].discard(nick.lower())
+
+def replay(factory, channels, lines, events):
+    before = rss()
+    start = time()
+    members = factory()
+    for channel, names in lines:
+        members.namesReply(channel, names)
+    for channel in channels:
+        members.endOfNames(channel)
+    loaded = time() - start
+    memory = rss() - before
+
+    start = time()
+    for event in events:
+        if event[0] == 'quit':
+            members.quit(event[1])
+        elif event[0] == 'join':
+            members.add(event[1], event[2])
+        else:
+            members.remove(event[1], event[2])
+    return loaded, memory, time() - start
+
+def main(channels=50, nicks=50000, perChannel=20000):
+    random.seed(1)
+    pool = ['Nick%d[%s]' % (i, random.choice('abcxyz')) for i in range(nicks)]
+    channelList = ['#Chan%d' % (i,) for i in range(channels)]
+    lines = burst(channelList, pool, perChannel)
+    events = []
+    for i in range(20000):
+        kind = random.choice(['quit', 'join', 'part'])
+        if kind == 'quit':
+            events.append((kind, random.choice(pool)))
+        else:
+            events.append((kind, random.choice(channelList), random.choice(pool)))
+
+    print '%d channels x %d nicks from a pool of %d, %d NAMES lines, %d events' % (
+        channels, perChannel, nicks, len(lines), len(events))
+    for name, factory in [('plain sets', Plain), ('Membership', Membership)]:
+        loaded, memory, replayed = inChild(replay, factory, channelList, lines, events)
+        print '%-12s  NAMES %7.0f lines/s  %7d KB  events %8.0f/s' % (
+            name, len(lines) / loaded, memory, len(events) / replayed)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,187 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Lines sent and logged for one netsplit storm (everyone on the far side
+    quitting, then joining every channel again when the servers rejoin),
+    before (each QUIT and JOIN printed, logged, welcomed and re-authed on
+    its own) and after (NetsplitTracker batching the storm into one record
+    per split and per channel).  Output goes to /dev/null.
+
+    What batching saves is output: welcomes and WHOIS lines that would sit
+    in the flood-limited send queue for minutes, and log lines.  Reactor
+    time is shown as well, and is about the same either way, as the
+    batched path also keeps membership and login state.  The handlers are
+    copies of TehBot's (bot.py needs SOAPpy to import), using the real
+    NetsplitTracker, AuthManager and Membership.
+
+    Usage: python benchmarks/netsplit_storm.py [users] [channels] [admins]
+"""
+
+# system imports
+import os
+import random
+import sys
+from time import time, ctime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# twisted imports
+from twisted.internet import task
+
+# modules
+from modules import auth, netsplit
+from modules.membership import Membership
+
+_message = 'hub.example.net leaf.example.net'
+
+class Bot:
+    """The parts of TehBot a storm goes through, writing to /dev/null"""
+
+    def __init__(self, authUsers):
+        self.authUsers = authUsers
+        self.log = open(os.devnull, 'w')
+        self.sent = 0
+        self.logged = 0
+        self.members = Membership()
+
+    def sendLine(self, line):
+        self.sent += 1
+
+    def logLine(self, line):
+        self.log.write('%s %s\n' % (ctime(), line))
+        self.logged += 1
+
+class OldBot(Bot):
+    # as TehBot.userQuit, userJoined and cmd_login did before
+
+    def __init__(self, authUsers):
+        Bot.__init__(self, authUsers)
+        self.loggedIn = list(authUsers)
+
+    def userQuit(self, user, quitMessage):
+        if user.lower() in self.loggedIn:
+            self.loggedIn.remove(user.lower())
+        print 'QUIT: %s (%s)' % (user, quitMessage)
+        self.logLine('QUIT: %s (%s)' % (user, quitMessage))
+
+    def userJoined(self, user, channel):
+        print 'JOIN: %s on %s' % (user, channel)
+        self.logLine('JOIN: %s on %s' % (user, channel))
+        self.sendLine('PRIVMSG %s :Welcome to %s, %s' % (channel, channel, user))
+        if user in self.authUsers:
+            self.sendLine('WHOIS %s' % (user,))
+
+class NewBot(Bot):
+    # as TehBot.userQuit, userJoined, netsplitQuit and netsplitJoin do now
+
+    def __init__(self, authUsers):
+        Bot.__init__(self, authUsers)
+        self.auth = auth.AuthManager(self.sendLine)
+        for user in authUsers:
+            self.auth.login(user)
+        self.netsplit = netsplit.NetsplitTracker(self.netsplitQuit, self.netsplitJoin)
+
+    def userQuit(self, user, quitMessage):
+        if self.netsplit.quit(user, quitMessage):
+            return
+        self.auth.forget(user)
+        print 'QUIT: %s (%s) from %s' % (user, quitMessage, ', '.join(self.members.quit(user)))
+        self.logLine('QUIT: %s (%s)' % (user, quitMessage))
+
+    def userJoined(self, user, channel):
+        if self.netsplit.join(user, channel):
+            return
+        self.members.add(channel, user)
+        print 'JOIN: %s on %s' % (user, channel)
+        self.logLine('JOIN: %s on %s' % (user, channel))
+        self.sendLine('PRIVMSG %s :Welcome to %s, %s' % (channel, channel, user))
+
+    def netsplitQuit(self, servers, nicks):
+        for user in nicks:
+            self.members.quit(user)
+            self.auth.suspend(user)
+        print 'NETSPLIT: %s %s (%d users)' % (servers[0], servers[1], len(nicks))
+        self.logLine('NETSPLIT: %s %s (%d users): %s' % (servers[0], servers[1], len(nicks), ' '.join(nicks)))
+
+    def netsplitJoin(self, channel, nicks):
+        for user in nicks:
+            self.members.add(channel, user)
+            if not self.auth.resume(user) and user.lower() in self.authUsers:
+                self.auth.request(user)
+        print 'NETJOIN: %s (%d users)' % (channel, len(nicks))
+        self.logLine('NETJOIN: %s (%d users): %s' % (channel, len(nicks), ' '.join(nicks)))
+
+def storm(bot, clock, onChannels):
+    """Replays the storm, returns the reactor time it took"""
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        start = time()
+        for user in onChannels:
+            bot.userQuit(user, _message)
+        clock.advance(10)
+        for user, channels in onChannels.iteritems():
+            for channel in channels:
+                bot.userJoined(user, channel)
+        clock.advance(10)
+        return time() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+def main(users=3000, channels=10, admins=50):
+    random.seed(1)
+    channelList = ['#chan%d' % (i,) for i in range(channels)]
+    userList = ['user%d' % (i,) for i in range(users)]
+    authUsers = userList[:admins]
+    onChannels = {}
+    for user in userList:
+        onChannels[user] = random.sample(channelList, random.randint(1, min(3, channels)))
+    joins = sum([len(c) for c in onChannels.itervalues()])
+
+    results = []
+    for factory in [OldBot, NewBot]:
+        clock = task.Clock()
+        auth.reactor = netsplit.reactor = clock
+        auth.time = netsplit.time = clock.seconds
+        bot = factory(authUsers)
+        for user, chans in onChannels.iteritems():
+            for channel in chans:
+                bot.members.add(channel, user)
+        results.append((storm(bot, clock, onChannels), bot.sent, bot.logged))
+
+    print '%d users quit and rejoin %d times across %d channels, %d of them logged in' % (
+        users, joins, channels, admins)
+    for name, result in zip(['one by one', 'batched'], results):
+        # the queue empties at flood_rate lines a second, 2 by default
+        print '%-10s  %5d lines sent (%4.0f minutes of queue)  %5d lines logged  %8.1fms reactor time' % (
+            name, result[1], result[1] / 2.0 / 60, result[2], result[0] * 1000)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,104 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Lines and send time for HELP and LASTLOG replies, one PRIVMSG per line
+    (and LASTLOG wrapped at wrap_width, as before) against replies packed
+    with packLines. Send time is what the flood limiter (OutboundScheduler
+    at flood_rate 2, flood_burst 5) takes to let them all out, on a
+    simulated clock.
+
+    Usage: python benchmarks/packing.py [entries]
+"""
+
+# system imports
+import os
+import re
+import sys
+import textwrap
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# twisted imports
+from twisted.internet import task
+
+# modules
+from modules import scheduler
+from modules.scheduler import OutboundScheduler, packLines
+from modules.poller import formatEntry
+
+def helpLines():
+    """The command summaries HELP sends, taken from bot.py's docstrings"""
+    source = open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot.py')).read()
+    docs = re.findall(r'def cmd_(\w+)\(self[^)]*\):\s*"""([^"]*)"""', source)
+    return ['%s: %s' % (name, ' '.join(doc.split())) for name, doc in docs]
+
+def lastlogLines(entries):
+    lines = []
+    for rev in range(1000, 1000 + entries):
+        lines.extend(formatEntry({
+            'date': 'Sat Oct 18 12:00:00 2008', 'revision': str(rev), 'author': 'xor',
+            'message': 'Fix the thing that broke when the other thing was fixed\nand tidy up',
+            'files': ['/trunk/bot.py (M)', '/trunk/modules/svn.py (M)', '/trunk/modules/poller.py (A)'],
+        }))
+    return lines
+
+def maxPayload(prefix, nick='pychat'):
+    # as TehBot.maxPayload
+    return 512 - len(':%s!~%s@ ' % (nick, 'x' * 9)) - 63 - len(prefix) - 2
+
+def sendTime(lines):
+    """Seconds the flood limiter takes to send lines, on a simulated clock"""
+    clock = task.Clock()
+    scheduler.reactor = clock
+    scheduler.time = clock.seconds
+    sent = []
+    limiter = OutboundScheduler(sent.append, 2.0, 5)
+    for line in lines:
+        limiter.enqueue('#chan', line)
+    while len(sent) < len(lines):
+        clock.advance(0.01)
+    return clock.seconds()
+
+def main(entries=10):
+    prefix = 'PRIVMSG #chan :'
+    size = maxPayload(prefix)
+    print 'payload per line: %d bytes' % (size,)
+
+    for name, pieces, old in (
+            ('HELP', helpLines(), helpLines()),
+            ('LASTLOG %d' % entries, lastlogLines(entries),
+             sum([textwrap.wrap(line, 150) for line in lastlogLines(entries)], []))):
+        for label, lines in (('one per line', old),
+                             ('packed, wrap_width 150', packLines(pieces, min(size, 150))),
+                             ('packed, wrap_width 0', packLines(pieces, size))):
+            print '%-10s %-24s %4d lines %6d bytes  %6.1fs to send' % (
+                name, label, len(lines), sum([len(prefix) + len(line) + 2 for line in lines]), sendTime(lines))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,124 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Repository requests per poll as the number of announce targets grows.
+    SVNPoller polls each repository once, formats each commit once and
+    hands the lines to every subscriber; the old announcer asked for HEAD
+    every tick and then re-read the log once per target for each commit.
+    SVNPoller runs on the real reactor against fakesvn, one repository per
+    target count, with a commit to each every other poll.
+
+    Usage: python benchmarks/poller_fanout.py [seconds]
+"""
+
+# system imports
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# twisted imports
+from twisted.internet import reactor, task
+
+import fakesvn
+
+_targets = (1, 10, 100, 1000)
+
+class Subscriber:
+    """A network's bot, counting the lines it is asked to send"""
+
+    def __init__(self):
+        self.lines = 0
+
+    def announce(self, repo, targets, lines):
+        self.lines += len(lines) * len(targets)
+
+def oldCalls(svn, repo, ticks, targets):
+    # as svnAnnounce did before: lastRev every tick, cmd_lastlog per target per commit
+    repo.calls = 0
+    last = svn.lastRev()
+    for i in range(ticks):
+        if i % 2 == 0:
+            repo.commit()
+        rev = svn.lastRev()
+        if rev > last:
+            last = rev
+            for target in range(targets):
+                svn.lastLog(1, True)
+    return repo.calls
+
+def main(seconds=3):
+    # import after installing the fake pysvn
+    repo = fakesvn.install(100)
+    from modules import svn
+    from modules.poller import SVNPoller
+
+    print 'old announcer, requests per tick:'
+    for targets in _targets:
+        calls = oldCalls(svn.SVNInterface('file:///old'), repo, 100, targets)
+        print '  %5d targets  %7.2f' % (targets, calls / 100.0)
+
+    interval = 0.05
+    directory = tempfile.mkdtemp()
+    try:
+        repos = svn.SVNRepositories(directory)
+        poller = SVNPoller(repos, interval, interval)
+        subscribers = {}
+        for targets in _targets:
+            url = 'file:///bench%d' % (targets,)
+            fakesvn.repositories[url] = fakesvn.Repository(100)
+            # spread over up to 10 networks
+            subscribers[url] = [Subscriber() for i in range(min(targets, 10))]
+            for i in range(targets):
+                poller.subscribe(url, subscribers[url][i % 10], '#chan%d' % (i,))
+
+        def commit():
+            for repository in fakesvn.repositories.values():
+                repository.commit()
+        committer = task.LoopingCall(commit)
+        committer.start(interval * 2, False)
+        reactor.callLater(seconds, reactor.stop)
+        reactor.run()
+        poller.stop()
+        repos.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print 'SVNPoller, requests per poll:'
+    for targets in _targets:
+        url = 'file:///bench%d' % (targets,)
+        polls = poller.pollers[url].polls
+        lines = sum([subscriber.lines for subscriber in subscribers[url]])
+        print '  %5d targets  %7.2f  (%d polls, %d lines handed out)' % (
+            targets, float(fakesvn.repositories[url].calls) / polls, polls, lines)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,89 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Time per character of text.toAscii and text.sanitize against the old
+    TehBot.toAscii (string += per printable character) as the input doubles
+    in length.  Flat columns mean linear behaviour.
+
+    Usage: python benchmarks/sanitize.py [smallest] [steps]
+"""
+
+# system imports
+import os
+import random
+import string
+import sys
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# modules
+from modules import text
+
+def oldToAscii(s):
+    # as TehBot.toAscii did before
+    temp = ''
+    for char in s:
+        if char in string.printable:
+            temp += char
+    return temp
+
+def sample(size):
+    """IRC-ish text: mostly printable, with formatting, colours, control codes and UTF-8"""
+    pieces = ['hello', 'world', '\x02bold\x02', '\x0304,12red\x03', '\x1funder\x1f', '\x07',
+              'caf\xc3\xa9', '\x00', 'na\xc3\xafve', 'tab\there', '\x16rev\x16']
+    out = []
+    length = 0
+    while length < size:
+        piece = random.choice(pieces)
+        out.append(piece + ' ')
+        length += len(piece) + 1
+    return ''.join(out)[:size]
+
+def perChar(function, s):
+    repeat = max(1, 200000 / len(s))
+    start = time()
+    for i in range(repeat):
+        function(s)
+    return (time() - start) / repeat / len(s) * 1e9
+
+def main(smallest=1000, steps=8):
+    random.seed(1)
+    print '%10s  %14s  %14s  %14s' % ('chars', 'old toAscii', 'toAscii', 'sanitize')
+    size = smallest
+    for i in range(steps):
+        s = sample(size)
+        assert oldToAscii(s) == text.toAscii(s)
+        print '%10d  %11.1fns  %11.1fns  %11.1fns' % (size, perChar(oldToAscii, s),
+                                                       perChar(text.toAscii, s),
+                                                       perChar(text.sanitize, s))
+        size *= 2
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
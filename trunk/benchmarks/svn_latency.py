@@ -0,0 +1,93 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Reactor latency while a slow repository is being polled. A probe is
+    scheduled every 10ms and we measure how late it runs (how long a
+    command would wait for an answer), first with the SVN calls made in
+    worker threads (SVNInterface.deferLastLog), then the old way, with the
+    same call made on the reactor thread.
+
+    Usage: python benchmarks/svn_latency.py [seconds] [delay]
+"""
+
+# system imports
+import os
+import sys
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakesvn
+
+# twisted imports
+from twisted.internet import reactor, defer, task
+
+def phase(name, poll, seconds, interval=0.01):
+    """Polls with poll every 0.25s for seconds, measuring probe lag. Returns a Deferred"""
+    d = defer.Deferred()
+    lags = []
+    state = {'expected': time() + interval, 'end': time() + seconds}
+
+    def probe():
+        now = time()
+        lags.append(now - state['expected'])
+        if now < state['end']:
+            state['expected'] = now + interval
+            reactor.callLater(interval, probe)
+        else:
+            poller.stop()
+            d.callback((name, lags))
+
+    poller = task.LoopingCall(poll)
+    poller.start(0.25)
+    reactor.callLater(interval, probe)
+    return d
+
+def report(result):
+    name, lags = result
+    lags.sort()
+    print '%-10s %5d probes  avg %7.1fms  p99 %7.1fms  max %7.1fms' % (
+        name, len(lags), 1000 * sum(lags) / len(lags),
+        1000 * lags[int(len(lags) * 0.99)], 1000 * lags[-1])
+
+def main(seconds=3.0, delay=0.5):
+    fakesvn.install(100, delay)
+    from modules.svn import SVNInterface
+    svn = SVNInterface('file:///bench')
+
+    print 'repository answers in %.0fms, polled every 250ms for %.0fs' % (delay * 1000, seconds)
+    d = phase('threaded', lambda: svn.deferLastLog(1, True), seconds)
+    d.addCallback(report)
+    d.addCallback(lambda _: phase('blocking', lambda: svn.lastLog(1, True), seconds))
+    d.addCallback(report)
+    d.addBoth(lambda _: reactor.stop())
+    reactor.run()
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:]])
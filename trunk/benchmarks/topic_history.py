@@ -0,0 +1,121 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Memory held by the topic history over thousands of channels with
+    frequent topic changes, each changing one ' | ' segment: the old lists
+    of lists (with its trim, and with the trim bound fixed) against
+    TopicHistory's deques of interned segment tuples.
+
+    Usage: python benchmarks/topic_history.py [channels] [changes] [max undo]
+"""
+
+# system imports
+import os
+import random
+import sys
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# twisted imports
+from twisted.internet import task
+
+# modules
+from modules import topics
+from memory import rss, inChild
+
+class OldTopics:
+    # as TehBot.topicUpdated did before, fixed uses the intended bound
+
+    def __init__(self, maxUndo, fixed=False):
+        self.maxUndo = maxUndo
+        self.fixed = fixed
+        self.topics = {}
+        self.undos = {}
+
+    def updated(self, channel, newTopic):
+        if self.undos.has_key(channel):
+            if self.topics.has_key(channel):
+                if len(self.undos[channel]) > 0:
+                    if self.topics[channel] != self.undos[channel][-1]:
+                        self.undos[channel].append(self.topics[channel])
+                else:
+                    self.undos[channel].append(self.topics[channel])
+            else:
+                self.undos[channel] = []
+        else:
+            self.undos[channel] = []
+            if self.topics.has_key(channel):
+                self.undos[channel].append(self.topics[channel])
+
+        self.topics[channel] = [entry.strip() for entry in newTopic.split('|') if len(entry.strip()) > 0]
+        if self.fixed:
+            if len(self.undos[channel]) > self.maxUndo:
+                del self.undos[channel][:len(self.undos[channel]) - self.maxUndo]
+        else:
+            del self.undos[channel][:len(self.undos) - self.maxUndo]
+
+def newTopics(maxUndo):
+    clock = task.Clock()
+    topics.reactor = clock  # never advanced, so nothing is saved
+    return topics.TopicHistory(os.devnull, maxUndo)
+
+def churn(channels, changes):
+    """(channel, topic) updates, each a new string like a line read off the network.
+       A few segments stay the same and one keeps changing"""
+    updates = []
+    for i in range(changes):
+        for c in range(channels):
+            topic = 'Welcome to #chan%d | Rules: http://example.org/rules | Latest release: 1.%d | %s' % (
+                c, i % 3, random.choice(['be nice', 'no spam', 'meeting at %d' % (random.randint(1, 24),)]))
+            updates.append(('#chan%d' % (c,), topic))
+    return updates
+
+def replay(factory, args, updates):
+    before = rss()
+    start = time()
+    history = factory(*args)
+    for channel, topic in updates:
+        history.updated(channel, topic)
+    elapsed = time() - start
+    kept = sum([len(undo) for undo in history.undos.values()])
+    return rss() - before, elapsed, kept
+
+def main(channels=5000, changes=40, maxUndo=10):
+    random.seed(1)
+    updates = churn(channels, changes)
+    print '%d channels x %d topic changes, max undo %d' % (channels, changes, maxUndo)
+    for name, factory, args in [('old lists', OldTopics, (maxUndo,)),
+                                ('old, fixed trim', OldTopics, (maxUndo, True)),
+                                ('TopicHistory', newTopics, (maxUndo,))]:
+        memory, elapsed, kept = inChild(replay, factory, args, updates)
+        print '%-16s  %7d KB  %6.0fms  %7d undo entries kept' % (name, memory, elapsed * 1000, kept)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
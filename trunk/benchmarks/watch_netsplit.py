@@ -0,0 +1,122 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Replays a netsplit (thousands of QUITs, a few by watched users) into the
+    watch counters, before (every QUIT rewrote every watched user's .watch
+    file) and after (WatchStore, journalling watched quits and syncing them
+    in batches).  Files are written to a temporary directory.
+
+    Usage: python benchmarks/watch_netsplit.py [quits] [watched] [messages]
+"""
+
+# system imports
+import os
+import random
+import shutil
+import sys
+import tempfile
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# twisted imports
+from twisted.internet import task
+
+# modules
+from modules import watch
+
+def oldReplay(directory, userWatch, quits):
+    # as TehBot.userQuit and writeWatchDataToFile did before
+    writes = 0
+    for user, quitMessage in quits:
+        if userWatch.has_key(user.lower()):
+            messages = userWatch[user.lower()]
+            messages[quitMessage.lower()] = messages.get(quitMessage.lower(), 0) + 1
+
+        current = os.getcwd()
+        os.chdir(directory)
+        for user in userWatch:
+            f = open(user + '.watch', 'w')
+            for message in userWatch[user]:
+                f.write('%s<*!*>%s' % (message, userWatch[user][message]))
+            f.close()
+            writes += 1
+        os.chdir(current)
+    return writes
+
+def newReplay(directory, watched, quits):
+    clock = task.Clock()
+    watch.reactor = clock
+    store = watch.WatchStore(directory)
+    store.load(watched)
+    for user, quitMessage in quits:
+        if user.lower() in watched:
+            store.record(user, quitMessage)
+    clock.advance(store.syncDelay)
+    store.close()
+    return store
+
+def main(count=2000, watched=20, messages=50):
+    random.seed(1)
+    watchList = ['watched%d' % (i,) for i in range(watched)]
+    userWatch = {}
+    for user in watchList:
+        userWatch[user] = {}
+        for i in range(messages):
+            userWatch[user]['quit message %d' % (i,)] = random.randint(1, 100)
+
+    quits = []
+    for i in range(count):
+        if random.random() < 0.02:
+            user = random.choice(watchList)
+        else:
+            user = 'user%d' % (i,)
+        quits.append((user, 'irc.example.org irc2.example.org'))
+    counted = len([user for user, message in quits if user in userWatch])
+
+    directory = tempfile.mkdtemp()
+    try:
+        start = time()
+        writes = oldReplay(directory, userWatch, quits)
+        old = time() - start
+
+        shutil.rmtree(directory)
+        os.mkdir(directory)
+        start = time()
+        newReplay(directory, watchList, quits)
+        new = time() - start
+    finally:
+        shutil.rmtree(directory)
+
+    print '%d quits, %d by the %d watched users (%d messages each)' % (count, counted, watched, messages)
+    print 'rewrite per quit  %8.1fms  %d files written' % (old * 1000, writes)
+    print 'journal           %8.1fms  1 journal sync, 1 snapshot' % (new * 1000,)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
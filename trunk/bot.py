@@ -31,146 +31,249 @@
 from twisted.protocols import ident
 from twisted.words.protocols import irc
 from twisted.internet import reactor, protocol, error
-from twisted.application.internet import TimerService
 
 # python imports
-from os import sys, getcwd, chdir, mkdir
+from os import sys
+from os.path import join
 from time import localtime, asctime, strftime, time
 from exceptions import UnicodeEncodeError
-import string
-import textwrap
 import re
 
 # modules
 from modules.options import BotOptions
-from modules.svn import SVNInterface
+from modules.svn import SVNRepositories
 from modules.ident import IdentServer, IdentFactory
-from modules.logging import MessageLogger
-from modules.search import GoogleSearch
+from modules.logging import MessageLogger, NetworkLog
+from modules.logstore import LogStore
+from modules.search import getSearch, SearchSessions
+from modules.scheduler import OutboundScheduler, packLines
+from modules.commands import buildRegistry, findCommand, HelpIndex
+from modules.auth import AuthManager
+from modules.membership import Membership
+from modules.watch import WatchStore
+from modules.storage import Storage
+from modules.netsplit import NetsplitTracker
+from modules.topics import TopicHistory
+from modules.poller import SVNPoller, formatEntry
+from modules.hooks import HookFactory
 from modules.utils import *
+from modules.text import sanitize, stripControl
 
 _admin_commands = ['disable', 'enable', 'open', 'close']
+_command_aliases = {'commands': 'help'}
 
 class TehBot(irc.IRCClient):
     """A IRC bot."""
 
+    signed = False      # signed on, so messages can go out
+
     def connectionMade(self):
-        self.logger = MessageLogger(open(self.factory.filename, "a"))
+        self.logger = self.factory.logger
         self.logger.log("[connected at %s]" % asctime(localtime(time())))
         self.options = self.factory.options
         self.svn = self.factory.svn
+        self.scheduler = OutboundScheduler(self.sendScheduledLine, self.options.floodRate, self.options.floodBurst)
+        self.batch = {}
+        self.batchOrder = []
+        self.batchDepth = 0
+        self.caller = None
+        self.helpIndex = self.factory.helpIndex
         self.nickname = self.options.nick
         self.realname = self.options.name
-        self.authQ = []
-        self.loggedIn = []
-        self.topics = {}
-        self.redos = {}
-        self.undos = {}
-        self.userWatch = {}
-        self.undo = False
-        self.lastSearchStart = -1
-        self.lastSearchQuery = None
+        self.auth = AuthManager(self.sendLine, self.loggedInAs, batch=self.options.whoisBatch)
+        self.members = Membership()
+        self.netsplit = NetsplitTracker(self.netsplitQuit, self.netsplitJoin)
+        self.loggedIn = self.auth.loggedIn
+        # kept by the factory, so a reconnect doesn't have to load them again
+        self.topics = self.factory.topics
+        self.watch = self.factory.watch
+        self.userWatch = self.watch.data
+        self.searches = self.factory.searches
         self.init()
         irc.IRCClient.connectionMade(self)
 
     def connectionLost(self, reason):
+        self.signed = False
         irc.IRCClient.connectionLost(self, reason)
+        self.scheduler.stop()
+        self.auth.stop()
+        self.netsplit.stop()
+        self.topics.lost()
+        self.watch.sync()
+
+        # remembered for the resync once we are back
+        self.factory.channels = list(self.options.channels)
+        self.factory.loggedIn = set(self.loggedIn)
+        del self.options.channels[:]
+
         self.logger.log("[disconnected at %s]" % asctime(localtime(time())))
-        self.logger.close()
+        self.logger.flush()
 
     def init(self):
         # set vars that may change during execution
         self.versionName = self.options.options['CLIENTNAME']
         self.versionNum = self.options.options['VERSION']
         self.versionEnv = sys.platform
-        self.options.options['REVISION'] = self.svn.lastRev()
-        self.readWatchDataFromFile()
-        
-        # SVN announce code
-        if self.options.announce:    # if svn announce commits mode
-            # create/start timer
-            self.timer = TimerService(self.options.frequency, self.svnAnnounce)
-            self.timer.startService()
-        else:
-            if hasattr(self, 'timer') and self.timer.running:  # if running
-                self.timer.stopService() # stop it
-    
-    def svnAnnounce(self):
-        rev = self.svn.lastRev()
 
-        if rev == -1:
-            print 'ERROR: Error connecting to SVN repo'
-            return
-        
-        if rev != self.options.options['REVISION']: # check against stored revision
-            # new commit, yay :)
-            temp = int(self.options.options['REVISION'])
-            temp += 1
-            self.options.options['REVISION'] = str(temp)
-            for target in self.options.announce_targets:    # tell everybody about it
-                self.cmd_lastlog(target, target, [])
+    # outgoing messages, all go through the scheduler
 
-    def writeWatchDataToFile(self):
-        """Outputs watch data to permanent storage (disk)"""
-        if not checkDir('watchdata'):
-            mkdir('watchdata')
+    def sendLine(self, line):
+        """Server traffic (PONG, JOIN, WHOIS, ...) has its own lane, ahead of every message"""
+        self.scheduler.enqueue(None, line)
 
-        current = getcwd()
-        chdir('watchdata')
+    def sendScheduledLine(self, line):
+        irc.IRCClient.sendLine(self, line)
 
-        for user in self.userWatch:
-            f = open(user + '.watch', 'w')
-            for message in self.userWatch[user]:
-                f.write('%s<*!*>%s' % (message, self.userWatch[user][message]))
-            f.close()   
+    def msg(self, user, message, length=None):
+        """Queues a PRIVMSG for user, split into lines that fit"""
+        self.queueMessage('PRIVMSG', user, message, length)
 
-        chdir(current)
+    def notice(self, user, message):
+        """Queues a NOTICE for user"""
+        self.queueMessage('NOTICE', user, message)
 
-    def readWatchDataFromFile(self):
+    def queueMessage(self, command, target, message, length=None):
+        if isinstance(message, unicode):
+            message = message.encode('utf-8')
+
+        if self.batchDepth and not message.startswith('\x01'):
+            # inside a command handler, hold on to it so replies can be packed together
+            key = (command, target)
+            if not self.batch.has_key(key):
+                self.batch[key] = []
+                self.batchOrder.append(key)
+            self.batch[key].extend(message.split('\n'))
+            return
+
+        if message.startswith('\x01'):
+            # CTCP, must go out exactly as it is
+            self.sendPacked(command, target, [message], length, False)
+        else:
+            self.sendPacked(command, target, message.split('\n'), length)
+
+    def sendPacked(self, command, target, pieces, length=None, wrap=True):
+        """Packs pieces into as few lines as will fit (in wrap_width, if wrap) and queues them"""
+        prefix = '%s %s :' % (command, target)
+        size = self.maxPayload(prefix, length)
+        if wrap and self.options.wrapWidth > 0:
+            # shorter lines than the server allows, if configured
+            size = min(size, self.options.wrapWidth)
+        priority = target.lower() in self.options.authors  # admin replies go next, after server traffic
+
+        for line in packLines(pieces, size):
+            self.scheduler.enqueue(target.lower(), prefix + line, priority)
+
+    def maxPayload(self, prefix, length=None):
+        """Returns the number of bytes left for text after the server adds our
+           :nick!user@host prefix, assuming the longest user and host"""
+        return (length or 512) - len(':%s!~%s@ ' % (self.nickname, 'x' * 9)) - 63 - len(prefix) - 2
+
+    def beginBatch(self):
+        """Starts collecting replies, they are sent packed by endBatch"""
+        if self.batchDepth == 0:
+            self.batch = {}
+            self.batchOrder = []
+        self.batchDepth += 1
+
+    def endBatch(self):
+        self.batchDepth -= 1
+        if self.batchDepth == 0:
+            for command, target in self.batchOrder:
+                self.sendPacked(command, target, self.batch[(command, target)])
+            self.batch = {}
+            self.batchOrder = []
+
+    def svnError(self, failure):
+        """Errback for SVN calls running in worker threads"""
+        print 'ERROR: SVN call failed: %s' % (failure.getErrorMessage(),)
+
+    def announceLines(self, targets, lines):
+        """Sends the lines of an announced commit (see SVNPoller) to targets"""
+        self.beginBatch()
+        try:
+            for target in targets:
+                for line in lines:
+                    self.msg(target, line)
+        finally:
+            self.endBatch()
+
+    def writeWatchDataToFile(self):
         """Outputs watch data to permanent storage (disk)"""
-        if not checkDir('watchdata'):
-            mkdir('watchdata')
-
-        current = getcwd()
-        chdir('watchdata')
-
-        for user in self.options.watchUsers:
-            if not self.userWatch.has_key(user):
-                self.userWatch[user] = {}
-            try:
-                f = open(user + '.watch', 'r')
-                for line in f:
-                    message, count = line.split('<*!*>')
-                    self.userWatch[user][message.strip()] = int(count)
-                f.close()
-            except IOError:
-                continue
-            
-        chdir(current)
+        self.watch.compact()
+
+    def readWatchDataFromFile(self):
+        """Reads watch data from permanent storage (disk)"""
+        self.watch.load(self.options.watchUsers)
 
     # callbacks for events
 
     def signedOn(self):
         """Called when bot has succesfully signed on to server."""
+        self.factory.resetDelay()
         if self.options.registeredNick:
             self.msg('nickserv','identify ' + self.options.nickPassword)
-        for chan in self.options.chanstojoin:
-            self.join(chan)
+
+        # after a reconnect, also go back to the channels we were on
+        self.joinChannels(self.options.chanstojoin + self.factory.channels)
+
+        # and check those who were logged in are still who they were (one batched WHOIS)
+        for user in self.factory.loggedIn:
+            self.auth.request(user)
+        self.factory.loggedIn = set()
+
+        # and announce the commits made while we were away
+        self.signed = True
+        self.factory.sendHeld()
+
+    def joinChannels(self, channels, size=400):
+        """Joins channels with as few JOIN a,b,c lines as possible"""
+        seen = set()
+        line = []
+        length = 0
+        for channel in channels:
+            if channel.lower() in seen:
+                continue
+            seen.add(channel.lower())
+            if line and length + len(channel) + 1 > size:
+                self.sendLine('JOIN %s' % (','.join(line),))
+                line = []
+                length = 0
+            line.append(channel)
+            length += len(channel) + 1
+        if line:
+            self.sendLine('JOIN %s' % (','.join(line),))
 
     def joined(self, channel):
         """This will get called when the bot joins the channel."""
         self.options.channels.append(channel.lower())
+
+    def irc_RPL_NAMREPLY(self, prefix, params):
+        """Part of the list of users on a channel"""
+        self.members.namesReply(params[2], params[3])
+
+    def irc_RPL_ENDOFNAMES(self, prefix, params):
+        """End of the list of users on a channel, try to log in authorised users on it"""
+        members = self.members.endOfNames(params[1])
+        # the auth manager only sends one WHOIS per user, however many channels we join
         for user in self.options.authUsers:
-            if user.lower() not in self.loggedIn:
-                print ' *** Attempting login for %s on %s' % (user, channel)
-                self.cmd_login(user, channel, [])
+            if self.members.key(user) in members:
+                self.auth.request(user)
 
     def userJoined(self, user, channel):
         """Called when a user joins a channel Im on"""
         user = user.split('!', 1)[0]
         if user != self.nickname:
+            if self.netsplit.join(user, channel):
+                # back from a netsplit, handled along with everyone else in netsplitJoin
+                return
+
             print 'JOIN: %s on %s' % (user, channel)
             self.logger.log('JOIN: %s on %s' % (user, channel))
+            self.logger.record(channel, user, 'join')
+
+            if not self.members.add(channel, user):
+                # we already had them there, don't welcome them twice
+                return
             
             if self.options.welcome:
                 if user.lower() in self.options.authUsers:
@@ -178,12 +281,41 @@ class TehBot(irc.IRCClient):
                 else:
                     self.msg(channel, 'Welcome to %s, %s' % (channel, user))
 
-            if user in self.options.authUsers:
+            if user.lower() in self.options.authUsers:
                 print ' *** Attempting login for %s on %s' % (user, channel)
-                self.cmd_login(user, channel, [])
+                self.auth.request(user)
+
+    def userLeft(self, user, channel):
+        """Called when a user leaves a channel Im on"""
+        user = user.split('!', 1)[0]
+        if self.members.remove(channel, user):
+            self.auth.unseen(user)
+
+    def userKicked(self, kickee, channel, kicker, message):
+        """Called when a user is kicked from a channel Im on"""
+        if self.members.remove(channel, kickee):
+            self.auth.unseen(kickee)
+
+    def userRenamed(self, oldname, newname):
+        """Called when a user changes nick"""
+        self.members.rename(oldname, newname)
+        # the new nick has to identify itself again
+        authorised = newname.lower() in self.options.authUsers
+        if authorised:
+            print ' *** Attempting login for %s' % (newname,)
+        self.auth.renamed(oldname, newname, authorised)
+
+    def isMember(self, user, channel, target):
+        """Checks target is on channel (if we know who is), tells user if not"""
+        if self.members.channels.has_key(self.members.key(channel)) and not self.members.isOn(channel, target):
+            self.msg(user, 'ERROR: %s is not on %s' % (target, channel))
+            return False
+        return True
 
     def kickedFrom(self, channel, kicker, message):
         """Called when Im kicked from a channel"""
+        for user in self.members.part(channel):
+            self.auth.unseen(user)
         if self.options.rejoin:
             self.join(channel)
             self.msg(channel, '%s: thanks for that (%s)' % (kicker, message))
@@ -193,38 +325,37 @@ class TehBot(irc.IRCClient):
         user = user.split('!', 1)[0]
         msg = data.strip()
         self.logger.log('(%s): *%s %s ' % (channel, user, msg))
+        if channel != self.nickname:
+            self.logger.record(channel, user, 'action', msg)
    
     def cmd_login(self, user, channel, params):
         """Gains usage access to bot. Usage: LOGIN"""
         #XXX:   this is non-RFC standard message (307), so may not 
         #       work on other servers, besides Shadowfire
         if user.lower() in self.options.authUsers:
-            self.authQ.append(user)
-            self.sendLine("WHOIS %s" % user)
+            self.auth.request(user)
         else:
             self.msg(user, 'ERROR: You Are Not Authorised!')
     
     def cmd_logout(self, user, channel, params):
         """Removes usage access to bot. Usage: LOGOUT"""
-        if user.lower() in self.loggedIn:
-            self.loggedIn.remove(user.lower())
-        else:
+        if not self.auth.logout(user):
             self.msg(user, 'ERROR: Not Logged In')
     
     def irc_307(self, prefix, params):
         """Reply from WHOIS message, indicates a registered nick"""
-        if len(params) == 3:
-            user = params[1].lower()
-            msg = params[2]
-
-            if user in self.authQ:
-                self.authQ.remove(user)
-                if user not in self.loggedIn:
-                    if msg == 'is a registered nick':
-                        self.loggedIn.append(user)
-                
-                        if self.options.announceLogins:
-                            self.msg(user, 'You are now Logged In!')
+        if len(params) == 3 and params[2] == 'is a registered nick':
+            self.auth.identify(params[1])
+
+    def irc_RPL_ENDOFWHOIS(self, prefix, params):
+        """End of a WHOIS reply"""
+        if len(params) > 1:
+            self.auth.endOfWhois(params[1])
+
+    def loggedInAs(self, user):
+        """Called by the auth manager when user has logged in"""
+        if self.options.announceLogins:
+            self.msg(user, 'You are now Logged In!')
    
     def privmsg(self, user, channel, msg):
         """This will get called when the bot receives a message."""
@@ -233,6 +364,8 @@ class TehBot(irc.IRCClient):
         checkUser = user.lower()
 
         self.logger.log('%s (%s): %s' % (user, channel, msg))
+        if channel != self.nickname:
+            self.logger.record(channel, user, 'msg', msg)
 
         if channel in self.options.channels:
         # if from channel,then only process if proceeded by nick: or !nick:
@@ -259,28 +392,28 @@ class TehBot(irc.IRCClient):
             return
         
         # is the message from an authorised user? or open command? 
-        if checkUser in self.loggedIn or command.lower() in self.options.openCommands:
+        name, cmd, error = findCommand(self.registry, command, checkUser, self.loggedIn, self.options)
+        if name is not None:
             print 'DEBUG: Remote Command %s from %s with parameters: %s' % (command, user, params)
             self.logger.log('Remote Command: %s from %s with parameters: %s' % (command, user, params))
 
+            self.caller = checkUser
+
             # special cases
-            if command.lower() == 'login':
+            if error is not None:
+                self.msg(user, '%s: %s' % (error, command))
+            elif name == 'login':
                 self.cmd_login(checkUser, channel, params)
-            elif command.lower() == 'logout':
+            elif name == 'logout':
                 self.cmd_logout(checkUser, channel, params)
-            elif command.lower() in _admin_commands and checkUser not in self.options.authors:
-                self.msg(user, 'ERROR: Administrator only command: %s' % command)
-            elif command.lower() in self.options.disabledCommands and checkUser not in self.options.authors:
-                self.msg(user, 'ERROR: Disabled command: %s' % command)
             else:
                 # despatch command
+                # replies are collected and packed into as few lines as possible
+                self.beginBatch()
                 try:
-                    handler = getattr(self, 'cmd_' + command.lower())
-                except AttributeError:
-                    self.msg(user, 'Unrecognised command: %s' % command)
-                else:
-                    # call the handler here in case it throws an AttributeError
-                    handler(user, channel, params)
+                    cmd.handler(self, user, channel, params)
+                finally:
+                    self.endBatch()
 
     # User commands
 
@@ -297,9 +430,10 @@ class TehBot(irc.IRCClient):
 
         target = params[0]
         if (target.lower() == 'me'):
-            target = user
+            target = self.caller
 
-        self.mode(channel, 1, 'o', user=target)
+        if self.isMember(user, channel, target):
+            self.mode(channel, 1, 'o', user=target)
 
     def cmd_deop(self, user, channel, params):
         """Removes Channel operator status from a user. Usage: DEOP [channel] <user | me>"""
@@ -309,9 +443,10 @@ class TehBot(irc.IRCClient):
 
         target = params[0]
         if (target.lower() == 'me'):
-            target = user
+            target = self.caller
 
-        self.mode(channel, 0, 'o', user=target)
+        if self.isMember(user, channel, target):
+            self.mode(channel, 0, 'o', user=target)
 
     def cmd_topic(self, user, channel, params):
         """ Updates the current channel's topic. Usage: TOPIC [channel] [command] <topic>
@@ -335,10 +470,7 @@ class TehBot(irc.IRCClient):
             
             command = params.pop(0).lower()
     
-            if not self.topics.has_key(channel): 
-                self.topics[channel] = []
-                
-            current = self.topics[channel]
+            current = list(self.topics.current(channel))
 
             if command == 'add':
                 temp = current + [' '.join(params)]
@@ -375,47 +507,18 @@ class TehBot(irc.IRCClient):
             topic = params.pop(0)
 
             if topic == 'get':
-                if self.topics.has_key(channel):
-                    self.msg(user, 'topic for %s is: %s' % (channel, ' | '.join(self.topics[channel])))
-                else:
-                    self.msg(user, 'topic for %s is: %s' % (channel, ''))
+                self.msg(user, 'topic for %s is: %s' % (channel, ' | '.join(self.topics.current(channel))))
                 return
             elif topic == 'undo':
-                if not self.undos.has_key(channel):
-                    self.msg(user, 'ERROR: No undos available')
-                    return
-            
-                if len(self.undos[channel]) == 0:
+                topic = self.topics.undo(channel)
+                if topic is None:
                     self.msg(user, 'ERROR: No more undos left')
                     return
-                           
-                try:
-                    redo = self.redos[channel]
-                except KeyError:
-                    redo = []
-                    
-                temp = self.undos[channel].pop()
-                topic = ' | '.join(temp)
-                redo.append(self.topics[channel])
-                self.redos[channel] = redo
-                self.undo = True
-                del self.redos[channel][:len(redo) - self.options.maxUndo]
             elif topic == 'redo':
-                if not self.redos.has_key(channel):
-                    self.msg(user, 'ERROR: No redos available')
-                    return
-    
-                if len(self.redos[channel]) == 0:
+                topic = self.topics.redo(channel)
+                if topic is None:
                     self.msg(user, 'ERROR: No more redos left')
                     return
-
-                try:
-                    undo = self.undos[channel]
-                except KeyError:
-                    undo = []
-                    
-                temp = self.redos[channel].pop()
-                topic = ' | '.join(temp)
         else:
             return
        
@@ -431,6 +534,8 @@ class TehBot(irc.IRCClient):
         else:
             target = params[0]
             kickmsg = self.nickname
+        if not self.isMember(user, channel, target):
+            return
         print 'KICK: %s %s %s' % (channel, target, kickmsg)
         self.kick(channel, target, kickmsg)
 
@@ -449,9 +554,9 @@ class TehBot(irc.IRCClient):
     def cmd_suggest(self, user, channel, params):
         """Use google spell suggestion service to suggest a spelling. Usage: SUGGEST <word>"""
         if len(params) == 1:
-            s = GoogleSearch(self.options.proxy, self.options.key)
-            result = s.spell(params[0])
-            self.msg(user, 'Suggestion(s): %s' % (result, ))
+            d = self.getSearch().deferSpell(params[0])
+            d.addCallback(lambda result: self.msg(user, 'Suggestion(s): %s' % (result, )))
+            d.addErrback(self.searchError, user)
         else:
             self.msg(user, 'ERROR: No Parameters Given')
 
@@ -466,64 +571,63 @@ class TehBot(irc.IRCClient):
             return
                          
         query = ' '.join(params)
-        self.lastSearchStart = 0
-        self.lastSearchQuery = query
-
-        self.doGoogleSearch(user, query, 0, 5)
+        session = self.searches.start((self.caller, channel), self.getSearch(), query.decode('utf-8'))
+        self.doGoogleSearch(user, session, 5)
 
     def cmd_more(self, user, channel, params):
-        """Return next 5 results (if available) for last Google search. Usage: MORE"""
+        """Return next 5 results (if available) for your last Google search. Usage: MORE"""
+        session = self.searches.get((self.caller, channel))
 
-        if self.lastSearchQuery and self.lastSearchStart > -1:
-            self.doGoogleSearch(user, self.lastSearchQuery, self.lastSearchStart, 5)
+        if session:
+            self.doGoogleSearch(user, session, 5)
         else:
             self.msg(user, 'ERROR: No Active Searches')
-            
-    def doGoogleSearch(self, user, query, start, max):
-        """Perform Google search"""
 
-        self.lastSearchStart += max
+    def getSearch(self):
+        """Returns the shared Google search client for our proxy and key"""
+        return getSearch(self.options.proxy, self.options.key, self.options.searchEndpoint)
 
-        s = GoogleSearch(self.options.proxy, self.options.key)
-        result = s.search(query.decode('utf-8'), start, max)
+    def doGoogleSearch(self, user, session, max):
+        """Perform Google search, results come from the session's buffer when it can"""
+        self.searches.pages += 1
+        d = session.take(max)
+        d.addCallback(self.sendSearchResults, user, session)
+        d.addErrback(self.searchError, user)
 
-        if result:      
-            results = result.getResultElements()
+    def sendSearchResults(self, results, user, session):
+        if results:      
             count = 0
             msg = 'Results: '
 
             for entry in results:
-                title = htmlToText(entry.title.encode('utf-8'))
+                title = sanitize(htmlToText(entry.title.encode('utf-8')))
                 url = entry.URL
                 new = ' %s %s: <%s> |' % (msg, bold(title), url)
               
                 if len(new) > 430:
                     msg = msg[:-1]
-                    self.lastSearchStart -= count 
                     break
                 else:
                     msg = new
                     count+= 1
 
+            # MORE carries on after the last result we managed to show
+            session.putBack(results[count:])
+
             if msg[-1] == '|':
                 msg = msg[:-1]
 
-            msg += ' (search took %s seconds)' % (str(result.getSearchTime())[:6],)
+            msg += ' (search took %s seconds)' % (str(session.searchTime)[:6],)
 
             self.msg(user, msg.strip())
         else:
             self.msg(user, 'No Results')
-      
-    def toAscii(self, text):
-        """Removes all non-ascii characters"""
-        temp = ''
-        
-        for char in text:
-            if char in string.printable:
-                temp += char
 
-        return temp
-    
+    def searchError(self, failure, user):
+        """Errback for Google searches running in worker threads"""
+        print 'ERROR: Google search failed: %s' % (failure.getErrorMessage(),)
+        self.msg(user, 'ERROR: Search failed')
+      
     def cmd_notice(self, user, channel, params):
         """Sends a NOTICE. Usage: NOTICE [channel/user] <message>"""
         if len(params) > 1:
@@ -568,7 +672,7 @@ class TehBot(irc.IRCClient):
             if target.lower() in self.options.authUsers:
                 self.msg(user, 'ERROR: Already authorised: %s' % (target))
             else:
-                self.options.authUsers.append(target.lower())
+                self.options.authUsers.add(target.lower())
                 self.cmd_login(target.lower(), channel, [])
 
     def cmd_unauthorise(self, user, channel, params):
@@ -579,18 +683,13 @@ class TehBot(irc.IRCClient):
             elif target.lower() in self.options.authors:
                 self.msg(user, 'ERROR: Cannot remove owner: %s ' % (target))
             else:
-                self.options.authUsers.remove(target.lower())
-                if target.lower() in self.loggedIn:
-                    self.loggedIn.remove(target.lower())
+                self.options.authUsers.discard(target.lower())
+                self.auth.forget(target)
 
     def cmd_rename(self, user, channel, params):
         """Changes the bots name. Usage: RENAME <new name>."""
         self.setNick(params[0])
 
-    def cmd_commands(self, user, channel, params):
-        """Alias for HELP."""
-        self.cmd_help(user, channel, params)
-
     def cmd_disable(self, user, channel, params):
         """Disable specific command. Administrator use only. Usage: DISABLE <command> [command] ..."""
         for command in params:
@@ -598,7 +697,8 @@ class TehBot(irc.IRCClient):
                 self.msg(user, 'ERROR: Command %s is Already Disabled' % (command,))
                 continue
             else:
-                self.options.disabledCommands.append(command)
+                self.options.disabledCommands.add(command)
+        self.helpIndex.invalidate()
     
     def cmd_enable(self, user, channel, params):
         """Enable a disabled command. Administrator use only. Usage: ENABLE <command> [command] ..."""
@@ -607,7 +707,8 @@ class TehBot(irc.IRCClient):
                 self.msg(user, 'ERROR: Command %s is Not Disabled' % (command,))
                 continue
             else:
-                self.options.disabledCommands.remove(command)
+                self.options.disabledCommands.discard(command)
+        self.helpIndex.invalidate()
 
     def cmd_open(self, user, channel, params):
         """Allow public access to a specific command. Administrator use only. Usage: OPEN <command> [command] ..."""
@@ -616,7 +717,8 @@ class TehBot(irc.IRCClient):
                 self.msg(user, 'ERROR: Command %s is Already Public' % (command,))
                 continue
             else:
-                self.options.openCommands.append(command)
+                self.options.openCommands.add(command)
+        self.helpIndex.invalidate()
     
     def cmd_close(self, user, channel, params):
         """Disable a public command. Administrator use only. Usage: CLOSE <command> [command] ..."""
@@ -625,39 +727,43 @@ class TehBot(irc.IRCClient):
                 self.msg(user, 'ERROR: Command %s is Not Public' % (command,))
                 continue
             else:
-                self.options.openCommands.remove(command)
+                self.options.openCommands.discard(command)
+        self.helpIndex.invalidate()
 
     def cmd_admin(self, user, channel, params):
         """Restrict access to a specific command for administrators only. Administrator use only. Usage: ADMIN <command> [command] ..."""
         for command in params:
-            if command in _admin_commands:
+            cmd = self.registry.lookup(command.lower())
+            if cmd is None:
+                self.msg(user, 'ERROR: No such command: %s' % (command,))
+            elif cmd.level == 'admin':
                 self.msg(user, 'ERROR: Command %s is Already Restricted' % (command,))
-                continue
             else:
-                _admin_commands.append(command)
+                self.registry.setLevel(cmd.name, 'admin')
     
     def cmd_unadmin(self, user, channel, params):
         """Disable a admin command. Administrator use only. Usage: UNADMIN <command> [command] ..."""
         for command in params:
-            if command not in _admin_commands:
+            cmd = self.registry.lookup(command.lower())
+            if cmd is None or cmd.level != 'admin':
                 self.msg(user, 'ERROR: Command %s is Unrestricted' % (command,))
-                continue
             else:
-                _admin_commands.remove(command)
+                self.registry.setLevel(cmd.name, 'user')
 
     def cmd_disabled(self, user, channel, params):
         """Returns list of disabled commands. Usage: DISABLED"""
         if len(self.options.disabledCommands) == 0:
             self.msg(user, 'ERROR: No Disabled Commands')
         else:
-            self.msg(user, 'Disabled Commands: ' + ' '.join(self.options.disabledCommands))
+            self.msg(user, 'Disabled Commands: ' + ' '.join(sorted(self.options.disabledCommands)))
 
     def cmd_restricted(self, user, channel, params):
         """Returns list of restricted commands. Usage: RESTRICTED"""
-        if len(_admin_commands) == 0:
+        restricted = self.registry.restricted()
+        if len(restricted) == 0:
             self.msg(user, 'ERROR: No Restricted Commands')
         else:
-            self.msg(user, 'Restricted Commands: ' + ' '.join(_admin_commands))
+            self.msg(user, 'Restricted Commands: ' + ' '.join(sorted(restricted)))
 
     def cmd_telldik(self, user, channel, params):
         """For fun. Will be removed soon. Tells DickShinnery how often he has timed out. Usage: TELLDIK [nick]"""
@@ -682,7 +788,7 @@ class TehBot(irc.IRCClient):
         if len(self.options.openCommands) == 0:
             self.msg(user, 'ERROR: No Public Commands')
         else:
-            self.msg(user, 'Public Commands: ' + ' '.join(self.options.openCommands))
+            self.msg(user, 'Public Commands: ' + ' '.join(sorted(self.options.openCommands)))
 
     def cmd_userlog(self, user, channel, params):
         """Displays the watch log for specified user. Usage: USERLOG <user>"""
@@ -702,68 +808,95 @@ class TehBot(irc.IRCClient):
             self.msg(user, 'ERROR: No user specified')
 
     def cmd_help(self, user, channel, params):
-        """This screen. Displays available commands and descriptions (if available)"""
-        to_say = ['<commands>']
+        """This screen. Displays available commands and descriptions (if available). Usage: HELP [page N | command ...]"""
+        if self.caller in self.options.authors:
+            kind = 'author'
+        elif self.caller in self.loggedIn:
+            kind = 'user'
+        else:
+            kind = 'guest'
 
-        if len(params) > 0: # Specific help
+        if len(params) == 2 and params[0].lower() == 'page' and params[1].isdigit():
+            page = int(params[1])
+        elif len(params) > 0: # Specific help
             for command in params:
-                try:
-                    handler = getattr(self, 'cmd_' + command.lower())
-                    doc = handler.__doc__.splitlines()
-                    first = 'Help: %s: ' % (bold(command.upper()),)
-                    self.msg(user, first + doc.pop(0)) 
-                
-                    for msg in doc:
-                        self.msg(user, msg.strip()) 
-                except AttributeError:
+                help = self.helpIndex.help(command.lower())
+                if help is None:
                     self.msg(user, 'No help found: %s' % bold(command))
+                else:
+                    for msg in help:
+                        self.msg(user, msg)
+            return
         else: #general help
-            for attr in dir(self):
-                if attr.startswith('cmd_'):
-                    doc = getattr(self, attr).__doc__.splitlines()
-                    to_say.append('  %s: %s' % (attr[4:].upper(), doc[0]))
-            to_say.append('</commands>')
-            for msg in to_say:
-                self.msg(user, msg)
-    
-    
+            page = 1
+
+        for msg in self.helpIndex.page(kind, self.options, page):
+            self.msg(user, msg)
+
+    def cmd_searchlog(self, user, channel, params):
+        """Searches the channel logs. Usage: SEARCHLOG [channel] [nick:] <terms>"""
+        target = None
+        nick = None
+
+        if params and params[0][:1] in '#&+!':
+            target = params.pop(0)
+        if params and params[0].endswith(':'):
+            nick = params.pop(0)[:-1]
+
+        if not params and not nick:
+            self.msg(user, 'ERROR: No search terms given')
+            return
+
+        d = self.logger.search(params, target, nick)
+        d.addCallback(self.sendSearchLog, user)
+        d.addErrback(self.searchLogError, user)
+
+    def sendSearchLog(self, results, user):
+        """Callback for SEARCHLOG, the search runs in a worker thread"""
+        if not results:
+            self.msg(user, 'No matches')
+            return
+
+        for when, chan, who, kind, text in results:
+            stamp = strftime('%d/%m %H:%M', localtime(when))
+            if kind == 'action':
+                self.msg(user, '[%s] %s * %s %s' % (stamp, chan, who, text))
+            else:
+                self.msg(user, '[%s] %s <%s> %s' % (stamp, chan, who, text))
+
+    def searchLogError(self, failure, user):
+        """Errback for SEARCHLOG"""
+        print 'ERROR: SEARCHLOG failed: %s' % (failure.getErrorMessage(),)
+        self.msg(user, 'ERROR: Log search failed')
+
     def cmd_lastlog(self, user, channel, params):
-        """Displays the last n commit messages to our SVN repo. Usage: LASTLOG [num]"""
+        """Displays the last n commit messages to our SVN repo. Usage: LASTLOG [num | start:end]"""
+
+        if len(params) == 1 and ':' in params[0]:
+            # revision range, entries are sent as they arrive rather than all at the end
+            start, end = params[0].split(':', 1)
+            d = self.svn.streamLog(lambda entry: self.sendLog([entry], user), int(start), int(end), True)
+            d.addErrback(self.svnError)
+            return
     
         arg = len(params) == 1 and int(params[0]) or 1
-        log = self.svn.lastLog(arg, True)
-   
+        d = self.svn.deferLastLog(arg, True)
+        d.addCallback(self.sendLog, user)
+        d.addErrback(self.svnError)
+
+    def sendLog(self, log, user):
+        """Sends SVN log entries (as returned by SVNInterface.lastLog) to user"""
         if log == 'Error connecting to SVN repo':
             print 'ERROR: Error connecting to SVN repo'
             return
                    
-        for entry in log:
-            common = entry['date'] + ' r' + entry['revision']
-            messages = entry['message'].splitlines()
-            filelist = ', '.join(entry['files'])
-            files = ' - (' + filelist + ') [%s]' % (entry['author'], )
-            count = 1
-            
-            for message in messages:
-                if count > 1:
-                   message = ('- %s' % (message,)).rjust(len(common) + len(message) + 3)
-                else:    
-                   message = '%s - %s' % (common, message)
-    
-                msgs = textwrap.wrap(message, self.options.wrapWidth)
-                
-                wrapN = 1
-                
-                for msg in msgs:
-                    if wrapN > 1:
-                        self.msg(user, msg.rjust(len(msg) + len(common) + 3))
-                    else:
-                        self.msg(user, msg)
-                    wrapN += 1
-    
-                count += 1
-            
-            self.msg(user, files.rjust(len(common) + len(files)))
+        self.beginBatch()
+        try:
+            for entry in log:
+                for line in formatEntry(entry):
+                    self.msg(user, line)
+        finally:
+            self.endBatch()
 
     def cmd_action(self, user, channel, params):
         """Performs action in specified channel. Usage: ACTION [channel] action"""
@@ -783,17 +916,66 @@ class TehBot(irc.IRCClient):
             'NICK: ' + self.nickname,
             'NAME: ' + self.realname,
             'VERSION: ' + self.options.options['VERSION'],
-            'REVISION: ' + self.options.options['REVISION'],
+            'REVISION: ' + self.revision(),
             'CHANNELS: ' + ','.join(self.options.channels),
-            '<end stats>',
+            'QUEUE: %d lines waiting for %d targets' % (self.scheduler.depth(), len(self.scheduler.queues)),
+            'SEARCH: %d requests for %d pages of results' % (self.searches.totalRequests(), self.searches.pages),
+            'SENT: %d lines, wait %.2fs average, %.2fs max' % (self.scheduler.sent, self.scheduler.averageWait(), self.scheduler.maxWait),
         ]
 
+        stats.append('SVN POLLS: %d requests for %d repositories' % (self.factory.poller.totalPolls(), len(self.factory.poller.pollers)))
+
+        if self.svn.cache is not None:
+            stats.append('SVN CACHE: %d hits, %d misses' % (self.svn.cache.hits, self.svn.cache.misses))
+
+        stats.append('<end stats>')
+
         for stat in stats:
             self.msg(user, stat)
 
+    def revision(self):
+        """Latest revision of our repository, as seen by the poller or from the config"""
+        rev = self.factory.poller.revision(self.options.repo)
+        if rev < 0:
+            return self.options.options['REVISION']
+        return str(rev)
+
+    def cmd_watchrepo(self, user, channel, params):
+        """Announces commits to a repository. Usage: WATCHREPO [url [target]]"""
+        if not params:
+            if not self.factory.subscribed:
+                self.msg(user, 'Not watching any repositories')
+            for repo, target in sorted(self.factory.subscribed):
+                self.msg(user, '%s -> %s' % (repo, target))
+            return
+
+        repo = params[0]
+        if len(params) > 1:
+            target = params[1]
+        else:
+            target = channel
+        if not self.factory.watchRepo(repo, target):
+            self.msg(user, 'ERROR: Already announcing %s to %s' % (repo, target))
+
+    def cmd_unwatchrepo(self, user, channel, params):
+        """Stops announcing commits to a repository. Usage: UNWATCHREPO url [target]"""
+        if not params:
+            self.msg(user, 'ERROR: No repository given')
+            return
+
+        repo = params[0]
+        if len(params) > 1:
+            target = params[1]
+        else:
+            target = channel
+        if not self.factory.unwatchRepo(repo, target):
+            self.msg(user, 'ERROR: Not announcing %s to %s' % (repo, target))
+
     def cmd_reload(self, user, channel, params):
         """Reload the configuration file. Usage: RELOAD"""
         self.options.loadOptions()
+        self.factory.reloadRepos()
+        self.helpIndex.invalidate()
         self.writeWatchDataToFile()
         self.readWatchDataFromFile()
         self.msg(user, 'Config File Reloaded')
@@ -804,7 +986,7 @@ class TehBot(irc.IRCClient):
         if len(self.loggedIn) == 0:
             self.msg(user, 'ERROR: No Authorised Users Logged In')
         else:
-            self.msg(user, 'I Respond to: ' + ' '.join(self.loggedIn))
+            self.msg(user, 'I Respond to: ' + ' '.join(sorted(self.loggedIn)))
 
     def cmd_hop(self, user, channel, params):
         """Leaves and Rejoins channel. Usage: HOP [channel]"""
@@ -833,123 +1015,263 @@ class TehBot(irc.IRCClient):
 
     def userQuit(self, user, quitMessage):
         """Called when a user quits IRC"""
-        if user.lower() in self.loggedIn:
-            self.loggedIn.remove(user.lower())
-        print 'QUIT: %s (%s)' % (user, quitMessage)
+        if self.netsplit.quit(user, quitMessage):
+            # handled along with everyone else in netsplitQuit
+            return
+
+        self.auth.forget(user)
+        channels = self.members.quit(user)
+        print 'QUIT: %s (%s) from %s' % (user, quitMessage, ', '.join(channels))
 
         if user.lower() in self.options.watchUsers:
-            if self.userWatch.has_key(user.lower()):
-                if self.userWatch[user.lower()].has_key(quitMessage.lower()):
-                    self.userWatch[user.lower()][quitMessage.lower()] += 1
-                else:
-                    self.userWatch[user.lower()][quitMessage.lower()] = 1
-            else:
-                self.userWatch[user.lower()] = {}
-                self.userWatch[user.lower()][quitMessage.lower()] = 1
+            # journalled, not a rewrite of every watch file
+            self.watch.record(user, quitMessage)
         
-        self.writeWatchDataToFile()
         self.logger.log('QUIT: %s (%s)' % (user, quitMessage))
+        self.logger.record('*', user, 'quit', quitMessage)
             
+    def netsplitQuit(self, servers, nicks):
+        """Called once per netsplit with everyone who quit in it"""
+        for user in nicks:
+            self.members.quit(user)
+            self.auth.suspend(user)
+            if user.lower() in self.options.watchUsers:
+                self.watch.record(user, '%s %s' % servers)
+
+        print 'NETSPLIT: %s %s (%d users)' % (servers[0], servers[1], len(nicks))
+        self.logger.log('NETSPLIT: %s %s (%d users): %s' % (servers[0], servers[1], len(nicks), ' '.join(nicks)))
+        self.logger.record('*', '*', 'netsplit', '%s %s: %s' % (servers[0], servers[1], ' '.join(nicks)))
+
+    def netsplitJoin(self, channel, nicks):
+        """Called once per channel when users come back from a netsplit. No welcomes,
+           and users who were logged in before the split are logged straight back in"""
+        for user in nicks:
+            self.members.add(channel, user)
+            if not self.auth.resume(user) and user.lower() in self.options.authUsers:
+                self.auth.request(user)
+
+        print 'NETJOIN: %s (%d users)' % (channel, len(nicks))
+        self.logger.log('NETJOIN: %s (%d users): %s' % (channel, len(nicks), ' '.join(nicks)))
+        self.logger.record(channel, '*', 'netjoin', ' '.join(nicks))
+
     def topicUpdated(self, user, channel, newTopic):
         """Called when topic is updated and on first join to a channel"""
-        if self.undo:
-            self.undo = False
-            self.topics[channel] = [entry.strip() for entry in newTopic.split('|') if len(entry.strip()) > 0]                
-            return
-        
-        if self.undos.has_key(channel):
-            if self.topics.has_key(channel):
-                if len(self.undos[channel]) > 0:
-                    if self.topics[channel] != self.undos[channel][-1]:
-                        self.undos[channel].append(self.topics[channel])
-                else:
-                    self.undos[channel].append(self.topics[channel])
-            else:
-                self.undos[channel] = []
-        else:
-            self.undos[channel] = []
-            if self.topics.has_key(channel):
-                self.undos[channel].append(self.topics[channel])    
-        
-        self.topics[channel] = [entry.strip() for entry in newTopic.split('|') if len(entry.strip()) > 0]
-        del self.undos[channel][:len(self.undos) - self.options.maxUndo]
+        self.topics.updated(channel, stripControl(newTopic))
 
     def left(self, channel):
       self.options.channels.remove(channel.lower())
+      for user in self.members.part(channel):
+          self.auth.unseen(user)
       print 'PART: ', channel
       self.logger.log('PART: %s' % (channel,))
 
-class TehBotFactory(protocol.ClientFactory):
+# command table, built once rather than looked up on every message
+TehBot.registry = buildRegistry(TehBot, _admin_commands, _command_aliases)
+
+class TehBotFactory(protocol.ReconnectingClientFactory):
     """A factory for TehBots.
 
        A new protocol instance will be created each time we connect to the server.
+       Dropped or failed connections are retried with exponential backoff (and
+       jitter), going round the configured servers, and whatever the bot knows
+       (topics, watch data, help pages, searches) is kept here across connections
     """
 
     # the class of the protocol to build when new connection is made
     protocol = TehBot
 
-    def __init__(self, options, svn, logfile):
+    # networks still connected (or reconnecting), the reactor stops when none are left
+    running = 0
+
+    def __init__(self, options, svn, logger, storage, poller):
         self.options = options
+        self.servers = options.servers  # (host, port) to go round when reconnecting
+        self.server = 0
+        self.maxDelay = options.reconnectMaxDelay
+        if options.retries > 0:
+            self.maxRetries = options.retries
         self.svn = svn
         self.quit = False
-        self.filename = logfile
+        self.stopped = False
+        self.logger = logger
+        self.storage = storage
+        self.poller = poller
+        self.bot = None             # the connected TehBot, if any
+        self.subscribed = set()     # (repo, target) pairs announced by the poller
+        self.held = []              # (targets, lines) announced while we weren't signed on
+        self.maxHeld = 50           # commits to hold, oldest dropped first
+        self.watched = set()        # those added with WATCHREPO, kept in cache/repos
+        self.muted = set()          # configured ones dropped with UNWATCHREPO, until a reload
+        self.loadWatched()
+        self.resubscribe()
+
+        self.topics = TopicHistory(storage.path('cache', 'topics'), options.maxUndo)
+        self.topics.load()
+        self.watch = WatchStore(storage.path('watchdata'))
+        self.watch.load(options.watchUsers)
+        self.helpIndex = HelpIndex(self.protocol.registry)
+        self.searches = SearchSessions()
+        self.channels = []          # channels we were on when the connection was lost
+        self.loggedIn = set()       # and who was logged in
+        TehBotFactory.running += 1
+
+    def buildProtocol(self, addr):
+        self.bot = protocol.ClientFactory.buildProtocol(self, addr)
+        return self.bot
+
+    def announce(self, repo, targets, lines):
+        """Called by the poller with the lines for a new commit. The poller won't
+           offer it again, so while we are away it is held until we are back"""
+        if self.bot is not None and self.bot.signed:
+            self.bot.announceLines(targets, lines)
+        else:
+            self.held.append((list(targets), lines))
+            del self.held[:-self.maxHeld]
+
+    def sendHeld(self):
+        """Announces the commits held while we weren't signed on"""
+        held, self.held = self.held, []
+        for targets, lines in held:
+            self.bot.announceLines(targets, lines)
+
+    def resubscribe(self):
+        """Subscribes to the configured and watched repositories (and drops the rest)"""
+        wanted = set(self.watched)
+        if self.options.announce:
+            for target in self.options.announce_targets:
+                wanted.add((self.options.repo, target))
+        wanted -= self.muted
+
+        for repo, target in self.subscribed - wanted:
+            self.poller.unsubscribe(repo, self, target)
+        for repo, target in wanted - self.subscribed:
+            self.poller.subscribe(repo, self, target)
+        self.subscribed = wanted
+
+    def reloadRepos(self):
+        """Picks up the announce settings after the config file has been reloaded"""
+        self.muted.clear()
+        self.resubscribe()
+
+    def watchRepo(self, repo, target):
+        """Starts announcing repo to target. Returns False if it already was"""
+        if (repo, target) in self.subscribed:
+            return False
+        self.muted.discard((repo, target))
+        self.watched.add((repo, target))
+        self.saveWatched()
+        self.resubscribe()
+        return True
+
+    def unwatchRepo(self, repo, target):
+        """Stops announcing repo to target. Returns False if it wasn't"""
+        if (repo, target) not in self.subscribed:
+            return False
+        if (repo, target) in self.watched:
+            self.watched.discard((repo, target))
+            self.saveWatched()
+        else:
+            # configured in bot.cfg, so only until the next reload
+            self.muted.add((repo, target))
+        self.resubscribe()
+        return True
+
+    def loadWatched(self):
+        try:
+            f = open(self.storage.path('cache', 'repos'), 'r')
+        except IOError:
+            return
+        try:
+            for line in f:
+                if '\t' in line:
+                    repo, target = line.rstrip('\n').split('\t', 1)
+                    self.watched.add((repo, target))
+        finally:
+            f.close()
+
+    def saveWatched(self):
+        lines = ['%s\t%s\n' % (repo, target) for repo, target in sorted(self.watched)]
+        self.storage.atomicWrite(self.storage.path('cache', 'repos'), ''.join(lines))
 
     def clientConnectionLost(self, connector, reason):
-        """If we get disconnected, ..."""
-        if self.options.reconnect:
-            if self.quit:
-                reactor.stop()
-            else:
-                if self.options.retries:
-                    self.options.retries -= 1
-                    connector.connect()
-                else:
-                    reactor.stop()
+        """If we get disconnected, try again later unless we were told to quit"""
+        if self.options.reconnect and not self.quit:
+            self.reconnect(connector)
         else:
-            reactor.stop()
+            self.giveUp()
 
     def clientConnectionFailed(self, connector, reason):
-        print "connection failed:", reason
-        reactor.stop()
+        print "connection failed:", reason.getErrorMessage()
+        if self.options.reconnect and not self.quit:
+            self.reconnect(connector)
+        else:
+            self.giveUp()
 
-def checkDir(dir):
-    """Checks that directory is valid"""
+    def reconnect(self, connector):
+        """Retries on the next server after the backoff delay, or gives up after maxRetries"""
+        if self.maxRetries is not None and self.retries >= self.maxRetries:
+            print 'Giving up on %s after %d retries' % (connector.host, self.retries)
+            self.giveUp()
+            return
 
-    # get current directory
-    current = getcwd()
-        
-    try:
-        # try cd into directory
-        chdir(dir)
-            
-        # if that succeeds, switch back to previous directory...
-        chdir(current)
-    except OSError:
-        # invalid directory, thus return False
-        return False
-        
-    return True
+        self.server = (self.server + 1) % len(self.servers)
+        connector.host, connector.port = self.servers[self.server]
+        self.retry(connector)
+        print 'Reconnecting to %s:%d in %.1fs' % (connector.host, connector.port, self.delay)
+
+    def giveUp(self):
+        """Stops serving this network, and stops the bot once no network is left"""
+        if self.stopped:
+            return
+        self.stopped = True
+        self.stopTrying()
+        TehBotFactory.running -= 1
+        if TehBotFactory.running <= 0:
+            reactor.stop()
+
+    def close(self):
+        """Saves what is kept across connections, at shutdown"""
+        self.topics.stop()
+        self.watch.close()
 
 if __name__ == '__main__':
     
     # Create options object
     opt = BotOptions('bot.cfg')
 
-    # Create SVN Interface object
-    svn = SVNInterface(opt.repo)
-
-    # check for logs directory
-    if not checkDir('logs'):
-        mkdir('logs')
-
-    # generate logfile name
-    logfile = strftime('logs/%d%m%Y-%H%M%S.log', localtime())
-
-    # create factory protocol and application
-    f = TehBotFactory(opt, svn, logfile)
-
-    # connect factory to this host and port
-    reactor.connectTCP(opt.server, opt.port, f)
+    # all files live under the data directory, set up once here
+    storage = Storage(opt.dataDir)
+    storage.init('logs', join('logs', 'store'), 'cache', 'watchdata')
+
+    # one SVN interface, with its persistent log cache, per repository
+    repos = SVNRepositories(storage.path('cache'), opt.frequency)
+    reactor.addSystemEventTrigger('after', 'shutdown', repos.close)
+
+    # commit announcements, each repository is polled once for all networks
+    triggerFile = opt.triggerFile
+    if triggerFile:
+        triggerFile = storage.path(triggerFile)
+    poller = SVNPoller(repos, opt.frequency, opt.maxFrequency, triggerFile)
+    reactor.addSystemEventTrigger('before', 'shutdown', poller.stop)
+
+    # message log, buffered and rotated under logs/
+    logger = MessageLogger(storage.path('logs'), store=LogStore(storage.path('logs', 'store')))
+    reactor.addSystemEventTrigger('after', 'shutdown', logger.close)
+
+    # one connection per [network:name] section, or just the [irc] one
+    networks = opt.networks()
+    if not networks:
+        f = TehBotFactory(opt, repos.get(opt.repo), logger, storage, poller)
+        reactor.addSystemEventTrigger('after', 'shutdown', f.close)
+        reactor.connectTCP(opt.server, opt.port, f)
+
+    for network in networks:
+        netOpt = BotOptions('bot.cfg', network)
+        netStorage = Storage(storage.path('networks', network))
+        netStorage.init('cache', 'watchdata')
+        f = TehBotFactory(netOpt, repos.get(netOpt.repo), NetworkLog(logger, network), netStorage, poller)
+        reactor.addSystemEventTrigger('after', 'shutdown', f.close)
+        reactor.connectTCP(netOpt.server, netOpt.port, f)
 
     # listen for ident requests
     try:
@@ -957,5 +1279,14 @@ if __name__ == '__main__':
     except error.CannotListenError:
         pass
 
+    # listen for post-commit hooks, on localhost only
+    try:
+        if opt.hookPort:
+            reactor.listenTCP(opt.hookPort, HookFactory(poller), interface='127.0.0.1')
+        if opt.hookSocket:
+            reactor.listenUNIX(storage.path(opt.hookSocket), HookFactory(poller))
+    except error.CannotListenError, message:
+        print 'ERROR: Not listening for post-commit hooks: %s' % (message,)
+
     # run bot
     reactor.run()
@@ -0,0 +1,161 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# twisted imports
+from twisted.internet import reactor
+
+# system imports
+from time import time
+
+class AuthManager:
+    """
+        Keeps track of who is logged in, checking with the server (WHOIS)
+        that a nick is identified. Requests are deduplicated and coalesced
+        into WHOIS lines, and positive answers are remembered while the
+        nick stays in sight
+    """
+
+    def __init__(self, sendLine, onLogin=None, ttl=3600, delay=1.0, batch=1, timeout=10):
+        self.sendLine = sendLine
+        self.onLogin = onLogin      # called with the nick when someone logs in
+        self.ttl = ttl              # how long an identification is trusted (seconds)
+        self.delay = delay          # wait this long for more requests before sending WHOIS
+        self.batch = batch          # nicks per WHOIS line, many servers only answer for the first
+        self.timeout = timeout      # give up on a WHOIS reply after this long (seconds)
+        self.loggedIn = set()
+        self.queued = set()         # waiting for the next WHOIS batch
+        self.pending = {}           # WHOIS sent, waiting on the reply: nick -> when
+        self.identified = {}        # nick -> when the server said it was identified
+        self.suspended = {}         # nick -> when it was lost in a netsplit while logged in
+        self.call = None
+        self.whois = 0              # WHOIS lines sent
+
+    def request(self, nick):
+        """Asks for nick to be logged in once the server confirms it is identified"""
+        nick = nick.lower()
+        if nick in self.loggedIn or nick in self.queued:
+            return
+        sent = self.pending.get(nick)
+        if sent is not None and time() - sent < self.timeout:
+            return
+
+        when = self.identified.get(nick)
+        if when is not None and time() - when < self.ttl:
+            # we asked recently, no need to ask again
+            self.login(nick)
+            return
+
+        self.queued.add(nick)
+        if self.call is None:
+            self.call = reactor.callLater(self.delay, self.flush)
+
+    def flush(self):
+        """Sends WHOIS for everyone queued, a few nicks per line"""
+        self.call = None
+        nicks = list(self.queued)
+        nicks.sort()
+        self.queued.clear()
+        now = time()
+        for nick in nicks:
+            self.pending[nick] = now
+
+        for i in range(0, len(nicks), self.batch):
+            self.sendLine('WHOIS %s' % (','.join(nicks[i:i + self.batch]),))
+            self.whois += 1
+
+    def identify(self, nick):
+        """The server says nick is identified (RPL_WHOISREGNICK, 307)"""
+        nick = nick.lower()
+        if self.pending.has_key(nick):
+            del self.pending[nick]
+            self.identified[nick] = time()
+            self.login(nick)
+
+    def endOfWhois(self, nicks):
+        """End of a WHOIS reply, anyone in it not identified by now isn't"""
+        for nick in nicks.lower().split(','):
+            self.pending.pop(nick, None)
+
+    def login(self, nick):
+        if nick not in self.loggedIn:
+            self.loggedIn.add(nick)
+            if self.onLogin is not None:
+                self.onLogin(nick)
+
+    def logout(self, nick):
+        """Logs nick out, returns False if it wasn't logged in"""
+        nick = nick.lower()
+        if nick not in self.loggedIn:
+            return False
+        self.loggedIn.discard(nick)
+        return True
+
+    def forget(self, nick):
+        """nick has gone (quit, nick change), so log it out and drop what we knew"""
+        nick = nick.lower()
+        self.loggedIn.discard(nick)
+        self.queued.discard(nick)
+        self.pending.pop(nick, None)
+        self.identified.pop(nick, None)
+        self.suspended.pop(nick, None)
+
+    def renamed(self, old, new, authorised):
+        """old changed nick to new, which has to identify itself again. If
+           new is an authorised user, ask the server whether it has"""
+        self.forget(old)
+        self.forget(new)
+        if authorised:
+            self.request(new)
+
+    def unseen(self, nick):
+        """We share no channel with nick any more, so we wouldn't see it quit and
+           someone else take the nick. Stop trusting its last identification"""
+        self.identified.pop(nick.lower(), None)
+
+    def suspend(self, nick):
+        """nick was lost in a netsplit, log it out but remember it was logged in"""
+        nick = nick.lower()
+        if nick in self.loggedIn:
+            self.loggedIn.discard(nick)
+            self.suspended[nick] = time()
+
+    def resume(self, nick):
+        """nick is back from a netsplit, log it straight back in (without a WHOIS)
+           if it was logged in before and the split wasn't too long ago"""
+        nick = nick.lower()
+        when = self.suspended.pop(nick, None)
+        if when is not None and time() - when < self.ttl:
+            self.loggedIn.add(nick)
+            return True
+        return False
+
+    def stop(self):
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
@@ -0,0 +1,117 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# system imports
+from time import time
+
+class LRUCache:
+    """
+        A dictionary-like cache holding at most size items, dropping the least
+        recently used first. Items older than ttl seconds (if given) are stale
+    """
+
+    def __init__(self, size=100, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self.items = {}     # key -> [key, value, expires, prev, next]
+        self.head = None    # most recently used
+        self.tail = None    # least recently used
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return self.get(key, _missing, False) is not _missing
+
+    def unlink(self, node):
+        if node[3] is None:
+            self.head = node[4]
+        else:
+            node[3][4] = node[4]
+        if node[4] is None:
+            self.tail = node[3]
+        else:
+            node[4][3] = node[3]
+
+    def link(self, node):
+        """Puts node at the head of the list"""
+        node[3] = None
+        node[4] = self.head
+        if self.head is not None:
+            self.head[3] = node
+        self.head = node
+        if self.tail is None:
+            self.tail = node
+
+    def get(self, key, default=None, count=True):
+        """Returns the cached value for key, or default if missing or stale"""
+        node = self.items.get(key)
+        if node is not None and node[2] is not None and node[2] < time():
+            self.remove(key)
+            node = None
+
+        if node is None:
+            if count:
+                self.misses += 1
+            return default
+
+        if count:
+            self.hits += 1
+        self.unlink(node)
+        self.link(node)
+        return node[1]
+
+    def put(self, key, value):
+        if self.items.has_key(key):
+            self.remove(key)
+
+        if self.ttl is None:
+            expires = None
+        else:
+            expires = time() + self.ttl
+
+        node = [key, value, expires, None, None]
+        self.items[key] = node
+        self.link(node)
+
+        while len(self.items) > self.size:
+            self.remove(self.tail[0])
+
+    def remove(self, key):
+        node = self.items.pop(key, None)
+        if node is not None:
+            self.unlink(node)
+
+    def clear(self):
+        self.items = {}
+        self.head = self.tail = None
+
+_missing = object()
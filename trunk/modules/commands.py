@@ -0,0 +1,189 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# modules
+from utils import bold
+
+class Command:
+    """
+        A bot command: its handler, help text and who may use it
+    """
+
+    def __init__(self, name, handler, level='user'):
+        self.name = name
+        self.handler = handler        # unbound, called as handler(bot, user, channel, params)
+        self.level = level            # 'user' or 'admin'
+        self.doc = (handler.__doc__ or '').strip().splitlines()
+
+        if not self.doc:
+            self.doc = ['No description']
+
+        # prebuilt help output
+        self.summary = '%s: %s' % (name.upper(), self.doc[0])
+        self.help = ['Help: %s: %s' % (bold(name.upper()), self.doc[0])]
+        self.help.extend([line.strip() for line in self.doc[1:]])
+
+class CommandRegistry:
+    """
+        Maps command names (and aliases) to Commands, built once per bot class
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self.aliases = {}
+        self.version = 0    # bumped whenever a command's level changes
+
+    def register(self, name, handler, level='user'):
+        self.commands[name] = Command(name, handler, level)
+
+    def alias(self, alias, name):
+        """Makes alias another name for command name"""
+        self.aliases[alias] = name
+
+    def resolve(self, name):
+        """Returns the real command name for name (which may be an alias)"""
+        return self.aliases.get(name, name)
+
+    def lookup(self, name):
+        """Returns the Command called name, or None"""
+        return self.commands.get(self.aliases.get(name, name))
+
+    def setLevel(self, name, level):
+        """Changes the access level of a command, returns False if there is no such command"""
+        command = self.lookup(name)
+        if command is None:
+            return False
+        if command.level != level:
+            command.level = level
+            self.version += 1
+        return True
+
+    def restricted(self):
+        """Returns the names of the administrator only commands"""
+        return [name for name, command in self.commands.iteritems() if command.level == 'admin']
+
+class HelpIndex:
+    """
+        HELP output, built from a CommandRegistry once per kind of user and
+        kept until the bot's open/disabled/admin settings change
+    """
+
+    def __init__(self, registry, pageSize=15):
+        self.registry = registry
+        self.pageSize = pageSize
+        self.views = {}
+        self.version = registry.version
+
+    def invalidate(self):
+        """Call when the open, disabled or admin commands change"""
+        self.views = {}
+
+    def view(self, kind, options):
+        """Returns the command summaries for kind of user: 'author', 'user' or 'guest'"""
+        if self.version != self.registry.version:
+            self.invalidate()
+            self.version = self.registry.version
+
+        if not self.views.has_key(kind):
+            names = self.registry.commands.keys()
+            names.sort()
+            lines = []
+            for name in names:
+                command = self.registry.commands[name]
+                if kind != 'author':
+                    # authors may use everything, others not admin or disabled commands
+                    if command.level == 'admin' or name in options.disabledCommands:
+                        continue
+                    if kind == 'guest' and name not in options.openCommands:
+                        continue
+                lines.append(command.summary)
+            self.views[kind] = lines
+        return self.views[kind]
+
+    def page(self, kind, options, page=1):
+        """Returns the lines of one page of help, with a header and footer"""
+        lines = self.view(kind, options)
+        pages = max(1, (len(lines) + self.pageSize - 1) / self.pageSize)
+        page = min(max(page, 1), pages)
+
+        start = (page - 1) * self.pageSize
+        if pages > 1:
+            header = '<commands page %d/%d>' % (page, pages)
+        else:
+            header = '<commands>'
+        return [header] + lines[start:start + self.pageSize] + ['</commands>']
+
+    def help(self, name):
+        """Returns the help lines for command name, or None"""
+        command = self.registry.lookup(name)
+        if command is None:
+            return None
+        return command.help
+
+def findCommand(registry, command, user, loggedIn, options):
+    """
+        Looks up command as sent by user (lower case), checking that user
+        may use it. Returns (name, Command, error): name is None if user
+        may not send this command at all, error is the reply when the
+        command is unknown, administrator only or disabled
+    """
+    name = registry.resolve(command.lower())
+    if user not in loggedIn and name not in options.openCommands:
+        return None, None, None
+
+    cmd = registry.lookup(name)
+    if name in ('login', 'logout'):
+        # anyone who got this far may log in or out
+        return name, cmd, None
+    if cmd is None:
+        return name, None, 'Unrecognised command'
+    if user not in options.authors:
+        if cmd.level == 'admin':
+            return name, cmd, 'ERROR: Administrator only command'
+        if name in options.disabledCommands:
+            return name, cmd, 'ERROR: Disabled command'
+    return name, cmd, None
+
+def buildRegistry(cls, admin=(), aliases={}, prefix='cmd_'):
+    """Builds a CommandRegistry from the prefix methods of cls"""
+    registry = CommandRegistry()
+
+    for attr in dir(cls):
+        if attr.startswith(prefix):
+            name = attr[len(prefix):]
+            if name in admin:
+                level = 'admin'
+            else:
+                level = 'user'
+            registry.register(name, getattr(cls, attr), level)
+
+    for alias, name in aliases.iteritems():
+        registry.alias(alias, name)
+
+    return registry
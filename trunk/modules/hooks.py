@@ -0,0 +1,63 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# twisted imports
+from twisted.protocols import basic
+from twisted.internet import protocol
+
+class HookReceiver(basic.LineReceiver):
+    """
+        Takes "repository revision" lines from post-commit hooks (see
+        hooks/post-commit) and has the poller announce that revision now
+    """
+
+    delimiter = '\n'
+
+    def lineReceived(self, line):
+        parts = line.strip().split()
+        if len(parts) != 2 or not parts[1].isdigit():
+            self.sendLine('ERROR usage: repository revision')
+            return
+
+        repo, rev = parts[0], int(parts[1])
+        pollers = self.factory.poller.find(repo)
+        if not pollers:
+            self.sendLine('ERROR not watching %s' % (repo,))
+            return
+
+        for poller in pollers:
+            poller.notify(rev)
+        self.sendLine('OK')
+
+class HookFactory(protocol.ServerFactory):
+    """A factory for HookReceivers. Only listen on localhost or a UNIX socket"""
+
+    protocol = HookReceiver
+
+    def __init__(self, poller):
+        self.poller = poller
@@ -28,24 +28,131 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 # twisted imports
-from twisted.python import log
+from twisted.internet import task, defer
 
 # system imports
 import time
+import os
+
+# modules
+from text import sanitize
 
 class MessageLogger:
     """
-        An independant logger class
+        An independant logger class. Lines are buffered and written out in
+        batches, and the file is rotated by size or at midnight
     """
-    def __init__(self, file):
-        self.file = file
+    def __init__(self, directory='logs', maxSize=10 * 1024 * 1024, maxLines=500, interval=2.0, store=None):
+        self.directory = directory
+        self.store = store          # optional LogStore for structured, searchable records
+        self.maxSize = maxSize      # rotate once the file grows past this (bytes)
+        self.maxLines = maxLines    # flush straight away once this many lines are waiting
+        self.buffer = []
+        self.file = None
+        self.size = 0
+        self.day = None
+        self.second = None          # timestamp cache, strftime runs at most once a second
+        self.stamp = ''
+
+        self.flusher = task.LoopingCall(self.flush)
+        self.flusher.start(interval, False)
+
+    def timestamp(self):
+        now = int(time.time())
+        if now != self.second:
+            self.second = now
+            self.stamp = time.strftime("[%H:%M:%S]", time.localtime(now))
+        return self.stamp
 
     def log(self, message):
-        """Write a message to the file."""
-        timestamp = time.strftime("[%H:%M:%S]", time.localtime(time.time()))
-        self.file.write('%s %s\n' % (timestamp, message))
+        """Queue a message for the file."""
+        self.buffer.append('%s %s\n' % (self.timestamp(), sanitize(message)))
+        if len(self.buffer) >= self.maxLines:
+            self.flush()
+
+    def record(self, channel, nick, kind, text=''):
+        """Add a structured record (kind is msg, action, join, quit, ...) to the store"""
+        if self.store is not None:
+            self.store.add(channel, nick, kind, sanitize(text))
+
+    def search(self, terms, channel=None, nick=None, limit=5, channels=None):
+        """Searches the structured records in a worker thread, see LogStore.search.
+           Returns a Deferred"""
+        if self.store is None:
+            return defer.succeed([])
+        return self.store.deferSearch(terms, channel, nick, limit, channels)
+
+    def channels(self):
+        """Returns the channels with structured records"""
+        if self.store is None:
+            return []
+        return self.store.channels()
+
+    def flush(self):
+        """Write out all buffered lines"""
+        if self.store is not None:
+            self.store.flush()
+
+        if not self.buffer:
+            return
+
+        if self.file is None or self.size >= self.maxSize or self.day != time.strftime('%Y%m%d'):
+            self.rotate()
+
+        data = ''.join(self.buffer)
+        self.buffer = []
+        self.file.write(data)
         self.file.flush()
+        self.size += len(data)
+
+    def rotate(self):
+        """Start a new log file"""
+        if self.file is not None:
+            self.file.close()
+
+        filename = os.path.join(self.directory, time.strftime('%d%m%Y-%H%M%S.log', time.localtime()))
+        self.file = open(filename, 'a')
+        self.size = self.file.tell()
+        self.day = time.strftime('%Y%m%d')
 
     def close(self):
-        self.file.close()
+        if self.flusher.running:
+            self.flusher.stop()
+        self.flush()
+        if self.store is not None:
+            self.store.close()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class NetworkLog:
+    """
+        One network's view of a MessageLogger shared by several networks.
+        Lines are tagged with the network name and channels are recorded as
+        channel@network, so the same channel name on two networks stays apart
+    """
+
+    def __init__(self, logger, network):
+        self.logger = logger
+        self.network = network
+
+    def channel(self, channel):
+        return '%s@%s' % (channel, self.network)
+
+    def log(self, message):
+        self.logger.log('[%s] %s' % (self.network, message))
+
+    def record(self, channel, nick, kind, text=''):
+        self.logger.record(self.channel(channel), nick, kind, text)
+
+    def search(self, terms, channel=None, nick=None, limit=5):
+        if channel:
+            return self.logger.search(terms, self.channel(channel), nick, limit)
+
+        # only this network's channels, not every channel in the shared store
+        suffix = self.channel('').lower()
+        channels = [chan for chan in self.logger.channels() if chan.endswith(suffix)]
+        return self.logger.search(terms, None, nick, limit, channels)
 
+    def flush(self):
+        self.logger.flush()
@@ -0,0 +1,442 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# system imports
+import os
+import re
+import time
+import marshal
+import threading
+import zlib
+
+# modules
+from storage import AtomicFile
+from cache import LRUCache
+from workers import WorkerPool
+
+_words = re.compile(r'\w+')
+
+def tokenize(text):
+    """Returns the set of lower cased words in text"""
+    return set(_words.findall(text.lower()))
+
+def readRecords(filename, offsets):
+    """Returns the records (when, channel, nick, kind, text) at offsets in a log file"""
+    records = []
+    f = open(filename, 'rb')
+    try:
+        for offset in offsets:
+            f.seek(offset)
+            when, channel, nick, kind, text = f.readline().rstrip('\n').split('\t', 4)
+            records.append((int(when), channel, nick, kind, text))
+    finally:
+        f.close()
+    return records
+
+class Segment:
+    """
+        One day of records for one channel: an append-only file of tab
+        separated records, plus an inverted index of word -> record offsets
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.words = {}
+        self.size = 0           # bytes of the log covered by the index
+        self.pending = []       # records not yet written
+        self.file = None
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Reads the saved index, then indexes whatever was logged after it was saved"""
+        try:
+            f = open(self.path + '.idx', 'rb')
+            try:
+                data = marshal.load(f)
+            finally:
+                f.close()
+            self.words = data['words']
+            self.size = data['size']
+        except (IOError, EOFError, ValueError, KeyError):
+            self.words = {}
+            self.size = 0
+
+        try:
+            f = open(self.path + '.log', 'rb')
+        except IOError:
+            return
+
+        try:
+            f.seek(self.size)
+            offset = self.size
+            for line in f:
+                fields = line.rstrip('\n').split('\t', 4)
+                if len(fields) == 5:
+                    self.index(offset, fields[2], fields[4])
+                offset += len(line)
+            self.size = offset
+        finally:
+            f.close()
+
+    def index(self, offset, nick, text):
+        self.dirty = True
+        for word in tokenize(text):
+            self.words.setdefault(word, []).append(offset)
+        self.words.setdefault('nick:' + nick.lower(), []).append(offset)
+
+    def add(self, when, channel, nick, kind, text):
+        text = text.replace('\t', ' ').replace('\n', ' ')
+        line = '%d\t%s\t%s\t%s\t%s\n' % (when, channel, nick, kind, text)
+        self.index(self.size, nick, text)
+        self.pending.append(line)
+        self.size += len(line)
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.file is None:
+            self.file = open(self.path + '.log', 'ab')
+        self.file.write(''.join(self.pending))
+        self.file.flush()
+        self.pending = []
+
+    def save(self):
+        """Writes out the index"""
+        self.flush()
+        if self.dirty:
+            f = AtomicFile(self.path + '.idx', 'wb')
+            try:
+                f.write(marshal.dumps({'size': self.size, 'words': self.words}))
+            except:
+                f.abort()
+                raise
+            f.commit()
+            self.dirty = False
+
+    def close(self):
+        self.save()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def find(self, terms):
+        """Returns offsets of records containing every term, newest first"""
+        return intersect([self.words.get(term, ()) for term in terms])
+
+    def read(self, offsets):
+        """Returns the records (when, channel, nick, kind, text) at offsets"""
+        self.flush()
+        return readRecords(self.path + '.log', offsets)
+
+def intersect(postings):
+    """Returns the offsets in every one of the postings lists, newest first.
+       The shortest list goes first, so the sets stay small"""
+    postings = [(len(offsets), offsets) for offsets in postings]
+    postings.sort()
+    result = None
+    for length, offsets in postings:
+        if not offsets:
+            return []
+        if result is None:
+            result = set(offsets)
+        else:
+            result.intersection_update(offsets)
+        if not result:
+            return []
+    result = list(result)
+    result.sort()
+    result.reverse()
+    return result
+
+class Postings:
+    """
+        The index of a channel's closed segments: every term's record offsets
+        for each day it was said on. Terms are hashed into a fixed number of
+        bucket files, and each closed day appends one record of its terms to
+        every bucket, so a search reads only the buckets of the terms it asks
+        for. Each term's offsets are marshalled on their own within the
+        record, and only decoded for the terms searched for.
+        postings/index says how much of each bucket is whole, anything after
+        that was cut short by a crash and is written over
+    """
+
+    def __init__(self, path, cache, buckets=256):
+        self.path = path            # channel directory
+        self.dir = os.path.join(path, 'postings')
+        self.cache = cache          # shared LRUCache of decoded buckets
+        self.buckets = buckets
+        try:
+            f = open(os.path.join(self.dir, 'index'), 'rb')
+            try:
+                data = marshal.load(f)
+            finally:
+                f.close()
+            self.days = data['days']
+            self.lengths = data['lengths']
+        except (IOError, EOFError, ValueError, KeyError):
+            self.days = {}          # day -> bytes of its log indexed
+            self.lengths = [0] * buckets
+
+    def bucket(self, term):
+        return (zlib.crc32(term) & 0xffffffffL) % self.buckets
+
+    def filename(self, bucket):
+        return os.path.join(self.dir, '%02x' % (bucket,))
+
+    def indexed(self, day):
+        """Returns True if the log for day is indexed up to its end"""
+        size = self.days.get(day)
+        return size is not None and size == os.path.getsize(os.path.join(self.path, day + '.log'))
+
+    def add(self, day, segment):
+        """Indexes a closed segment. Indexing the same day again replaces it"""
+        if not os.path.isdir(self.dir):
+            os.mkdir(self.dir)
+
+        buckets = {}
+        for word, offsets in segment.words.iteritems():
+            buckets.setdefault(self.bucket(word), {})[word] = marshal.dumps(offsets)
+
+        for bucket, words in buckets.iteritems():
+            data = marshal.dumps((day, words))
+            f = open(self.filename(bucket), 'ab')
+            try:
+                f.truncate(self.lengths[bucket])
+                f.write(data)
+            finally:
+                f.close()
+            self.lengths[bucket] += len(data)
+        self.days[day] = segment.size
+
+        f = AtomicFile(os.path.join(self.dir, 'index'), 'wb')
+        try:
+            f.write(marshal.dumps({'days': self.days, 'lengths': self.lengths}))
+        except:
+            f.abort()
+            raise
+        f.commit()
+
+    def read(self, bucket):
+        """Returns term -> {day: marshalled offsets} for the terms in bucket"""
+        key = (self.path, bucket)
+        length = self.lengths[bucket]
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == length:
+            return cached[1]
+
+        terms = {}
+        if length:
+            f = open(self.filename(bucket), 'rb')
+            try:
+                while f.tell() < length:
+                    day, words = marshal.load(f)
+                    for word, offsets in words.iteritems():
+                        terms.setdefault(word, {})[day] = offsets
+            finally:
+                f.close()
+        self.cache.put(key, (length, terms))
+        return terms
+
+    def lookup(self, term):
+        """Returns {day: marshalled offsets} for term, decoded only for the days a search gets to"""
+        return self.read(self.bucket(term)).get(term, {})
+
+class LogStore:
+    """
+        Structured message log, segmented per channel and per day, with an
+        inverted word index so searches don't have to scan the raw logs.
+        The day being written is searched through its Segment, closed days
+        through the channel's Postings. Searches may run in a worker thread
+        (deferSearch), so everything that touches the files takes the lock
+    """
+
+    def __init__(self, directory, cacheSize=256):
+        self.directory = directory     # absolute, see Storage
+        self.active = {}        # channel -> (day, Segment) being written to
+        self.postings = {}      # channel directory -> Postings
+        self.cache = LRUCache(cacheSize)    # (channel directory, bucket) -> decoded bucket
+        self.lock = threading.RLock()
+        self.workers = WorkerPool(1, 1)
+
+    def channelDir(self, channel):
+        # keep channel names safe as directory names
+        return os.path.join(self.directory, channel.lower().replace(os.sep, '_'))
+
+    def add(self, channel, nick, kind, text, when=None):
+        """Records a line said (or done) by nick in channel"""
+        if when is None:
+            when = time.time()
+        day = time.strftime('%Y%m%d', time.localtime(when))
+
+        self.lock.acquire()
+        try:
+            current = self.active.get(channel.lower())
+            if current is None or current[0] != day:
+                if current is not None:
+                    # new day, new segment
+                    current[1].close()
+                    self.index(current[1])
+                path = self.channelDir(channel)
+                if not os.path.isdir(path):
+                    os.mkdir(path)
+                current = (day, Segment(os.path.join(path, day)))
+                self.active[channel.lower()] = current
+
+            current[1].add(int(when), channel, nick, kind, text)
+        finally:
+            self.lock.release()
+
+    def flush(self):
+        self.lock.acquire()
+        try:
+            for day, segment in self.active.itervalues():
+                segment.flush()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            for day, segment in self.active.itervalues():
+                segment.close()
+                self.index(segment)
+            self.active = {}
+            self.postings = {}
+            self.cache.clear()
+        finally:
+            self.lock.release()
+
+    def channelPostings(self, path):
+        if not self.postings.has_key(path):
+            self.postings[path] = Postings(path, self.cache)
+        return self.postings[path]
+
+    def index(self, segment):
+        """Adds a closed segment to its channel's postings"""
+        path, day = os.path.split(segment.path)
+        self.channelPostings(path).add(day, segment)
+
+    def channels(self):
+        try:
+            return os.listdir(self.directory)
+        except OSError:
+            return []
+
+    def deferSearch(self, terms, channel=None, nick=None, limit=5, channels=None):
+        """search, run in a worker thread. Returns a Deferred"""
+        return self.workers.run(self.search, terms, channel, nick, limit, channels)
+
+    def search(self, terms, channel=None, nick=None, limit=5, channels=None):
+        """Returns up to limit records matching all terms (and nick), newest first.
+           Searches channel, or the given channels, or else every channel"""
+        # split the terms the way the records were indexed, "don't" is don and t
+        words = set()
+        for term in terms:
+            words.update(tokenize(term))
+        terms = list(words)
+        if nick:
+            terms.append('nick:' + nick.lower())
+        if not terms:
+            return []
+
+        if channel:
+            channels = [channel.lower()]
+        elif channels is None:
+            channels = self.channels()
+
+        self.lock.acquire()
+        try:
+            self.flush()
+            candidates = self.candidates(channels, terms)
+
+            results = []
+            last = None
+            for day, path, source in candidates:
+                if len(results) >= limit and day != last:
+                    # older days can't beat what we have
+                    break
+                last = day
+                if isinstance(source, Segment):
+                    offsets = source.find(terms)[:limit]
+                    if offsets:
+                        results.extend(source.read(offsets))
+                else:
+                    offsets = intersect([marshal.loads(postings[day]) for postings in source])[:limit]
+                    if offsets:
+                        results.extend(readRecords(os.path.join(path, day + '.log'), offsets))
+        finally:
+            self.lock.release()
+
+        results.sort()
+        results.reverse()
+        return results[:limit]
+
+    def candidates(self, channels, terms):
+        """Returns (day, channel directory, source) for every day that has all the
+           terms, newest first. source is the active Segment, or each term's postings,
+           the term on fewest days first"""
+        active = {}
+        for day, segment in self.active.itervalues():
+            active[segment.path] = segment
+
+        candidates = []
+        for chan in channels:
+            path = self.channelDir(chan)
+            try:
+                names = os.listdir(path)
+            except OSError:
+                continue
+
+            postings = self.channelPostings(path)
+            for name in names:
+                if name.endswith('.log'):
+                    day = name[:-4]
+                    segment = active.get(os.path.join(path, day))
+                    if segment is not None:
+                        candidates.append((day, path, segment))
+                    elif not postings.indexed(day):
+                        # closed without being indexed (a crash), or written to since
+                        segment = Segment(os.path.join(path, day))
+                        segment.close()
+                        postings.add(day, segment)
+
+            lookups = [postings.lookup(term) for term in terms]
+            lookups.sort(lambda a, b: cmp(len(a), len(b)))
+            for day in lookups[0]:
+                if active.has_key(os.path.join(path, day)):
+                    continue
+                for other in lookups[1:]:
+                    if not other.has_key(day):
+                        break
+                else:
+                    candidates.append((day, path, lookups))
+
+        candidates.sort(lambda a, b: cmp(b[0], a[0]))
+        return candidates
@@ -0,0 +1,139 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# system imports
+import string
+
+# RFC 1459 case mapping: []\~ are the upper case forms of {}|^
+_casemap = string.maketrans(string.ascii_uppercase + '[]\\~', string.ascii_lowercase + '{}|^')
+_prefixes = '@+%&~!'    # channel status prefixes in RPL_NAMREPLY
+
+def ircLower(name):
+    """Lower cases a nick or channel name the way the server does"""
+    return name.translate(_casemap)
+
+class Membership:
+    """
+        Who is on which channel. Nicks are case mapped and interned, so each
+        name is stored once however many channels it is on. A nick is only on
+        a few channels, so those are kept in a list, much smaller than a set
+    """
+
+    def __init__(self):
+        self.channels = {}  # channel -> set of nicks
+        self.nicks = {}     # nick -> list of channels
+        self.names = {}     # channel -> nicks from a RPL_NAMREPLY still coming in
+
+    def key(self, name):
+        return intern(ircLower(name))
+
+    def isOn(self, channel, nick):
+        members = self.channels.get(self.key(channel))
+        return members is not None and self.key(nick) in members
+
+    def members(self, channel):
+        return self.channels.get(self.key(channel), set())
+
+    def channelsOf(self, nick):
+        return self.nicks.get(self.key(nick), [])
+
+    def add(self, channel, nick):
+        """nick joined channel. Returns False if we already had it there"""
+        channel, nick = self.key(channel), self.key(nick)
+        members = self.channels.setdefault(channel, set())
+        if nick in members:
+            return False
+        members.add(nick)
+        self.nicks.setdefault(nick, []).append(channel)
+        return True
+
+    def remove(self, channel, nick):
+        """nick left channel (part or kick). Returns True if we share no channel with it any more"""
+        channel, nick = self.key(channel), self.key(nick)
+        self.channels.get(channel, set()).discard(nick)
+        channels = self.nicks.get(nick)
+        if channels is not None:
+            if channel in channels:
+                channels.remove(channel)
+            if not channels:
+                del self.nicks[nick]
+                return True
+        return False
+
+    def quit(self, nick):
+        """nick left IRC. Returns the channels it was on"""
+        channels = self.nicks.pop(self.key(nick), [])
+        for channel in channels:
+            self.channels[channel].discard(self.key(nick))
+        return channels
+
+    def rename(self, old, new):
+        channels = self.nicks.pop(self.key(old), [])
+        old, new = self.key(old), self.key(new)
+        for channel in channels:
+            self.channels[channel].discard(old)
+            self.channels[channel].add(new)
+        if channels:
+            self.nicks[new] = channels
+
+    def part(self, channel):
+        """We left channel, so forget everyone on it. Returns the nicks we share no channel with any more"""
+        channel = self.key(channel)
+        gone = []
+        for nick in self.channels.pop(channel, set()):
+            channels = self.nicks.get(nick)
+            if channels is not None:
+                if channel in channels:
+                    channels.remove(channel)
+                if not channels:
+                    del self.nicks[nick]
+                    gone.append(nick)
+        self.names.pop(channel, None)
+        return gone
+
+    def namesReply(self, channel, names):
+        """One RPL_NAMREPLY line, names as sent by the server"""
+        # case map the whole line at once, prefixes first as ~ maps to ^
+        names = ircLower(' '.join([name.lstrip(_prefixes) for name in names.split()]))
+        self.names.setdefault(self.key(channel), []).extend(map(intern, names.split()))
+
+    def endOfNames(self, channel):
+        """RPL_ENDOFNAMES, replaces what we knew about channel. Returns its members"""
+        nicks = self.names.pop(self.key(channel), [])
+        self.part(channel)
+        channel = self.key(channel)
+        members = self.channels[channel] = set(nicks)
+        index = self.nicks
+        for nick in members:
+            channels = index.get(nick)
+            if channels is None:
+                index[nick] = [channel]
+            else:
+                channels.append(channel)
+        return members
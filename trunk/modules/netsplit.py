@@ -0,0 +1,119 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# twisted imports
+from twisted.internet import reactor
+
+# system imports
+import re
+from time import time
+
+# a netsplit quit message is the two servers that split: "hub.example.net leaf.example.net"
+_netsplit = re.compile(r'^([\w*-]+(?:\.[\w*-]+)+) ([\w*-]+(?:\.[\w*-]+)+)$')
+
+def netsplitServers(message):
+    """Returns the (server, server) pair if message is a netsplit quit, else None"""
+    match = _netsplit.match(message.strip())
+    if match is None or match.group(1) == match.group(2):
+        return None
+    return match.groups()
+
+class NetsplitTracker:
+    """
+        Collapses the QUIT storm of a netsplit, and the JOIN storm when the
+        servers come back, into one batch each, handed to onSplit(servers, nicks)
+        and onJoin(channel, nicks) once the storm has passed
+    """
+
+    def __init__(self, onSplit, onJoin, delay=2.0, expire=3600):
+        self.onSplit = onSplit
+        self.onJoin = onJoin
+        self.delay = delay      # quiet time that ends a storm
+        self.expire = expire    # forget split nicks that haven't come back after this long
+        self.split = {}         # nick -> when it was lost in a netsplit
+        self.quits = {}         # (server, server) -> nicks quitting in this storm
+        self.joins = {}         # channel -> nicks coming back in this storm
+        self.call = None
+
+    def quit(self, nick, message):
+        """Returns True if this quit is part of a netsplit (and has been queued)"""
+        servers = netsplitServers(message)
+        if servers is None:
+            # an ordinary quit, so its next join is an ordinary one too
+            self.split.pop(nick.lower(), None)
+            return False
+
+        self.split[nick.lower()] = time()
+        self.quits.setdefault(servers, []).append(nick)
+        self.schedule()
+        return True
+
+    def join(self, nick, channel):
+        """Returns True if nick is coming back from a netsplit (and has been queued)"""
+        when = self.split.get(nick.lower())
+        if when is None:
+            return False
+        if time() - when > self.expire:
+            del self.split[nick.lower()]
+            return False
+
+        self.joins.setdefault(channel, []).append(nick)
+        self.schedule()
+        return True
+
+    def schedule(self):
+        # every quit or join in the storm pushes the flush back a little
+        if self.call is not None and self.call.active():
+            self.call.reset(self.delay)
+        else:
+            self.call = reactor.callLater(self.delay, self.flush)
+
+    def flush(self):
+        self.call = None
+        quits, joins = self.quits, self.joins
+        self.quits, self.joins = {}, {}
+
+        for servers, nicks in quits.iteritems():
+            self.onSplit(servers, nicks)
+        for channel, nicks in joins.iteritems():
+            self.onJoin(channel, nicks)
+            # they're back, anything they do from now on is ordinary
+            for nick in nicks:
+                self.split.pop(nick.lower(), None)
+
+        # drop nicks that never came back
+        now = time()
+        for nick, when in self.split.items():
+            if now - when > self.expire:
+                del self.split[nick]
+
+    def stop(self):
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
@@ -34,14 +34,18 @@ class BotOptions:
         Options Wrapper for Bot
     """
 
-    def __init__(self, configFile):
+    def __init__(self, configFile, network=None):
         self.options = {}
         self.channels = []
         self.retries = 0;
 
         self.configFile = configFile
+        self.network = network      # None for the config file as a whole
           
-        self.config = ConfigParser.ConfigParser()
+        if network:
+            self.config = NetworkConfig(network)
+        else:
+            self.config = ConfigParser.ConfigParser()
         self.loadOptions()
           
         self.config.read(self.configFile)
@@ -50,12 +54,15 @@ class BotOptions:
         self.name = self.config.get('irc', 'name')
         self.mode = self.config.getint('irc', 'mode')
         self.port = self.config.getint('irc', 'port')
+        self.servers = [(self.server, self.port)] + self.parseServers(self.getDefault(self.config.get, 'irc', 'servers', ''))
+        self.reconnectMaxDelay = self.getDefault(self.config.getint, 'irc', 'reconnect_max_delay', 300)
         self.repo = self.config.get('svn', 'repo')
+        self.dataDir = self.getDefault(self.config.get, 'general', 'data_dir', '.')
 
     def loadOptions(self):
         self.config.read(self.configFile)
         self.chanstojoin = self.config.get('irc', 'channels').split()
-        self.authUsers = self.config.get('general', 'remote_users').split() # only respond to commands from
+        self.authUsers = set(self.config.get('general', 'remote_users').lower().split()) # only respond to commands from
         self.rejoin = self.config.getboolean('irc', 'rejoin_on_kick')
         self.reconnect = self.config.getboolean('irc', 'reconnect_on_drop')
         self.welcome = self.config.getboolean('general', 'welcome_user')
@@ -64,18 +71,67 @@ class BotOptions:
         self.options['CLIENTNAME'] = self.config.get('about', 'client-name')
         self.registeredNick = self.config.getboolean('general', 'registered_nick')
         self.nickPassword = self.config.get('general', 'nick_password')
-        self.announce = self.config.get('svn', 'announce')
+        self.announce = self.config.getboolean('svn', 'announce')
         self.announce_targets = self.config.get('svn', 'who').split()
         self.frequency = self.config.getint('svn', 'frequency')
-        self.authors = ['xor', 'iddqd']
+        self.maxFrequency = self.getDefault(self.config.getint, 'svn', 'max_frequency', None)
+        self.triggerFile = self.getDefault(self.config.get, 'svn', 'trigger_file', None)
+        self.hookPort = self.getDefault(self.config.getint, 'svn', 'hook_port', None)
+        self.hookSocket = self.getDefault(self.config.get, 'svn', 'hook_socket', None)
+        self.authors = set(['xor', 'iddqd'])
         self.retries = self.config.getint('irc', 'retries')
-        self.openCommands = self.config.get('functions', 'open_commands').split()
-        self.disabledCommands = self.config.get('functions', 'disabled_commands').split()
+        self.openCommands = set(self.config.get('functions', 'open_commands').split())
+        self.disabledCommands = set(self.config.get('functions', 'disabled_commands').split())
         self.announceLogins = self.config.getboolean('general', 'announce_logins')
         self.wrapWidth = self.config.getint('general', 'wrap_width')
+        self.whoisBatch = self.getDefault(self.config.getint, 'general', 'whois_batch', 1)
         self.proxy = self.config.get('google', 'proxy')
         self.key = self.config.get('google', 'key')
+        self.searchEndpoint = self.getDefault(self.config.get, 'google', 'endpoint', None)
         self.maxUndo = self.config.getint('general', 'max_undo')
         self.watchUsers = self.config.get('fun', 'watch_users').split()
         self.channelChar = self.config.get('general', 'channel_char').strip()
+        self.floodRate = self.getDefault(self.config.getfloat, 'irc', 'flood_rate', 2.0)
+        self.floodBurst = self.getDefault(self.config.getint, 'irc', 'flood_burst', 5)
 
+    def parseServers(self, servers):
+        """Parses a list of host[:port], the port defaults to [irc] port"""
+        parsed = []
+        for server in servers.split():
+            if ':' in server:
+                host, port = server.split(':', 1)
+                parsed.append((host, int(port)))
+            else:
+                parsed.append((server, self.port))
+        return parsed
+
+    def networks(self):
+        """Returns the names of the [network:name] sections, in the order they appear"""
+        return [section[len('network:'):] for section in self.config.sections()
+                if section.startswith('network:')]
+
+    def getDefault(self, getter, section, option, default):
+        """Returns getter(section, option), or default if the config file doesn't set it"""
+        if self.config.has_option(section, option) and self.config.get(section, option).strip():
+            return getter(section, option)
+        return default
+
+class NetworkConfig(ConfigParser.ConfigParser):
+    """
+        The config file as seen by one network: options set in its
+        [network:name] section replace the same option in any other
+        section, so a network section only lists what differs
+    """
+
+    def __init__(self, network):
+        ConfigParser.ConfigParser.__init__(self)
+        self.network = 'network:' + network
+
+    def has_option(self, section, option):
+        return (ConfigParser.ConfigParser.has_option(self, self.network, option) or
+                ConfigParser.ConfigParser.has_option(self, section, option))
+
+    def get(self, section, option, raw=False, vars=None):
+        if ConfigParser.ConfigParser.has_option(self, self.network, option):
+            section = self.network
+        return ConfigParser.ConfigParser.get(self, section, option, raw, vars)
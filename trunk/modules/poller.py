@@ -0,0 +1,311 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# twisted imports
+from twisted.internet import reactor, task
+
+# system imports
+import os
+
+def formatEntry(entry):
+    """Formats a converted SVN log entry into a list of lines to send.
+       Long lines are left for the packer to split."""
+    common = entry['date'] + ' r' + entry['revision']
+    messages = entry['message'].splitlines() or ['']
+    filelist = ', '.join(entry['files'])
+
+    lines = ['%s - %s' % (common, messages[0])]
+    for message in messages[1:]:
+        lines.append('- %s' % (message,))
+    lines.append('(%s) [%s]' % (filelist, entry['author']))
+    return lines
+
+def repoName(repo):
+    """Short name of a repository URL for announcements, its last path component (above trunk)"""
+    parts = [part for part in repo.split('/') if part]
+    if len(parts) > 1 and parts[-1] == 'trunk':
+        parts.pop()
+    if not parts:
+        return repo
+    return parts[-1]
+
+class RepoPoller:
+    """
+        Polls one repository for new commits. Each commit is fetched and
+        formatted once, whatever the number of subscribers, and the lines
+        are handed to every subscriber with its targets.
+
+        The delay between polls adapts: it goes back to interval after a
+        commit, grows towards maxInterval while nothing happens, and backs
+        off exponentially (up to maxBackoff) while the repository fails
+    """
+
+    def __init__(self, svn, interval, maxInterval=None, maxBackoff=None, growth=1.5):
+        self.svn = svn
+        self.interval = interval        # fastest, used right after a commit
+        self.maxInterval = maxInterval or interval * 10
+        self.maxBackoff = maxBackoff or max(self.maxInterval, 900)
+        self.growth = growth            # delay multiplier per quiet poll
+        self.delay = interval           # until the next poll
+        self.errors = 0                 # failed polls in a row
+        self.name = repoName(svn.repo)
+        self.last = -1          # last announced revision, -1 until the first poll
+        self.polling = False
+        self.again = False      # poll again as soon as the current poll is done
+        self.bounded = False    # the current poll stops at a revision a hook named
+        self.polls = 0          # requests made to the repository
+        self.subscribers = {}   # subscriber -> set of targets
+        self.call = None
+
+    def subscribe(self, subscriber, target):
+        self.subscribers.setdefault(subscriber, set()).add(target)
+        if self.call is None and not self.polling:
+            self.schedule(0)
+
+    def unsubscribe(self, subscriber, target):
+        targets = self.subscribers.get(subscriber)
+        if targets is not None:
+            targets.discard(target)
+            if not targets:
+                del self.subscribers[subscriber]
+        if not self.subscribers:
+            self.stop()
+
+    def schedule(self, delay):
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = reactor.callLater(delay, self.poll)
+
+    def stop(self):
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+
+    def pollNow(self):
+        """Polls straight away, e.g. when a post-commit hook says something changed"""
+        if self.polling:
+            self.again = True
+        else:
+            self.delay = self.interval
+            self.poll()
+
+    def notify(self, rev):
+        """Announces revision rev (and any before it that were missed) without
+           waiting for the next poll. Used by the post-commit hook listener"""
+        if self.polling or self.last < 0:
+            # the poll under way doesn't know about rev, so ask again after it
+            self.pollNow()
+        elif rev > self.last:
+            self.delay = self.interval
+            self.poll(rev)
+
+    def poll(self, end=None):
+        """Asks the repository (in a worker thread) for everything after the last
+           revision, up to end (default HEAD)"""
+        self.stop()
+        if self.polling:
+            # previous poll still waiting on the repo
+            return
+
+        self.polling = True
+        self.bounded = end is not None
+        self.polls += 1
+        if self.last < 0:
+            # don't know where we are yet, so just find out (don't announce the whole history)
+            d = self.svn.deferLastRev()
+            d.addCallback(self.startRevision)
+        else:
+            d = self.svn.deferLogSince(self.last, True, end)
+            d.addCallback(self.announce)
+        d.addErrback(self.error)
+        d.addBoth(self.pollDone)
+
+    def pollDone(self, result):
+        self.polling = False
+        if not self.subscribers:
+            return
+        if self.again:
+            self.again = False
+            self.schedule(0)
+        else:
+            self.schedule(self.delay)
+
+    def succeeded(self, changed):
+        """Works out the next delay after a poll that reached the repository"""
+        self.errors = 0
+        if changed:
+            self.delay = self.interval
+        else:
+            self.delay = min(self.delay * self.growth, self.maxInterval)
+
+    def failed(self):
+        """Works out the next delay after a poll that didn't reach the repository"""
+        if self.bounded:
+            # the hook may have named a revision that doesn't exist (past HEAD, say),
+            # which says nothing about the repository, so just poll normally
+            self.again = True
+            return
+        self.errors += 1
+        self.delay = min(self.interval * 2 ** self.errors, self.maxBackoff)
+
+    def startRevision(self, rev):
+        if rev == -1:
+            print 'ERROR: Error connecting to SVN repo %s' % (self.svn.repo,)
+            self.failed()
+            return
+        self.last = int(rev)
+        self.succeeded(False)
+
+    def announce(self, log):
+        """Sends every new commit in log (oldest first) to the subscribers"""
+        if log == 'Error connecting to SVN repo':
+            print 'ERROR: Error connecting to SVN repo %s' % (self.svn.repo,)
+            self.failed()
+            return
+
+        # a hook notification and a poll may both bring the same commit
+        log = [entry for entry in log if int(entry['revision']) > self.last]
+
+        self.succeeded(len(log) > 0)
+        for entry in log:
+            # new commit, yay :)
+            lines = formatEntry(entry)
+            lines[0] = '[%s] %s' % (self.name, lines[0])
+            for subscriber, targets in self.subscribers.items():
+                subscriber.announce(self.svn.repo, targets, lines)
+            self.last = int(entry['revision'])
+
+    def error(self, failure):
+        print 'ERROR: SVN poll of %s failed: %s' % (self.svn.repo, failure.getErrorMessage())
+        self.failed()
+
+class SVNPoller:
+    """
+        The commit announcer shared by every network. Repositories are
+        polled on their own schedules while anyone is subscribed to them.
+        Subscribers have an announce(repo, targets, lines) method.
+        If triggerFile is given, touching it (from a post-commit hook, say)
+        polls every repository straight away
+    """
+
+    def __init__(self, repos, interval=30, maxInterval=None, triggerFile=None):
+        self.repos = repos          # SVNRepositories
+        self.interval = interval
+        self.maxInterval = maxInterval
+        self.pollers = {}           # url -> RepoPoller
+        self.trigger = None
+        if triggerFile:
+            self.trigger = TriggerFile(triggerFile, self.pollNow)
+
+    def subscribe(self, repo, subscriber, target):
+        if not self.pollers.has_key(repo):
+            self.pollers[repo] = RepoPoller(self.repos.get(repo), self.interval, self.maxInterval)
+        self.pollers[repo].subscribe(subscriber, target)
+
+    def unsubscribe(self, repo, subscriber, target):
+        poller = self.pollers.get(repo)
+        if poller is not None:
+            poller.unsubscribe(subscriber, target)
+            if not poller.subscribers:
+                # nobody watches it now, so its interface (and log cache) can go too
+                del self.pollers[repo]
+                self.repos.release(repo)
+
+    def revision(self, repo):
+        """Last revision seen in repo, or -1 if it isn't polled (or hasn't been yet)"""
+        poller = self.pollers.get(repo)
+        if poller is None:
+            return -1
+        return poller.last
+
+    def pollNow(self, repo=None):
+        """Polls repo (or every repository) without waiting for its next turn"""
+        if repo is None:
+            pollers = self.pollers.values()
+        elif self.pollers.has_key(repo):
+            pollers = [self.pollers[repo]]
+        else:
+            pollers = []
+        for poller in pollers:
+            poller.pollNow()
+
+    def find(self, repo):
+        """Returns the pollers for repo, given as its URL, its local path or its short name"""
+        if self.pollers.has_key(repo):
+            return [self.pollers[repo]]
+
+        path = repo.rstrip('/')
+        found = []
+        for url, poller in self.pollers.items():
+            if url.rstrip('/') == 'file://' + path or url.startswith('file://' + path + '/'):
+                found.append(poller)
+        if not found:
+            name = repoName(path.replace(os.sep, '/'))
+            for poller in self.pollers.values():
+                if poller.name == name:
+                    found.append(poller)
+        return found
+
+    def totalPolls(self):
+        return sum([poller.polls for poller in self.pollers.values()])
+
+    def stop(self):
+        if self.trigger is not None:
+            self.trigger.stop()
+        for poller in self.pollers.values():
+            poller.stop()
+
+class TriggerFile:
+    """
+        Calls callback whenever the file at path is touched. Checking is a
+        stat call every interval seconds, far cheaper than asking the repository
+    """
+
+    def __init__(self, path, callback, interval=1.0):
+        self.path = path
+        self.callback = callback
+        self.mtime = self.stat()
+        self.timer = task.LoopingCall(self.check)
+        self.timer.start(interval, False)
+
+    def stat(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def check(self):
+        mtime = self.stat()
+        if mtime != self.mtime:
+            self.mtime = mtime
+            if mtime is not None:
+                self.callback()
+
+    def stop(self):
+        if self.timer.running:
+            self.timer.stop()
@@ -0,0 +1,179 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# twisted imports
+from twisted.internet import reactor
+
+# system imports
+from collections import deque
+from time import time
+
+class OutboundScheduler:
+    """
+        Queues outgoing lines per target and sends them round-robin, with a
+        token bucket keeping us under the server's flood limits. Server
+        traffic (lines with no target) has a lane of its own that always
+        goes first, so a PONG never waits behind replies, then come
+        priority lines (admin replies), then everyone else
+    """
+
+    def __init__(self, send, rate=2.0, burst=5):
+        self.send = send          # called with each line when it is allowed out
+        self.rate = rate          # lines per second, long term
+        self.burst = burst        # lines we may send back to back
+        self.tokens = burst
+        self.stamp = time()
+        self.server = deque()     # server traffic, always first
+        self.priority = deque()   # admin replies, after server traffic
+        self.queues = {}          # target -> deque of (queued at, line)
+        self.order = deque()      # targets with queued lines, in round-robin order
+        self.call = None
+
+        # metrics
+        self.sent = 0
+        self.totalWait = 0.0
+        self.maxWait = 0.0
+
+    def enqueue(self, target, line, priority=False):
+        """Queue line for target, or for the server if target is None.
+           Priority lines skip ahead of all targets, but not the server lane"""
+        if target is None:
+            self.server.append((time(), line))
+        elif priority:
+            self.priority.append((time(), line))
+        else:
+            if not self.queues.has_key(target):
+                self.queues[target] = deque()
+                self.order.append(target)
+            self.queues[target].append((time(), line))
+        self.pump()
+
+    def depth(self):
+        """Returns the number of lines waiting to be sent"""
+        total = len(self.server) + len(self.priority)
+        for queue in self.queues.itervalues():
+            total += len(queue)
+        return total
+
+    def averageWait(self):
+        if self.sent == 0:
+            return 0.0
+        return self.totalWait / self.sent
+
+    def refill(self):
+        now = time()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def next(self):
+        """Returns the next line to go out, round-robin between targets"""
+        if self.server:
+            return self.server.popleft()
+        if self.priority:
+            return self.priority.popleft()
+
+        target = self.order.popleft()
+        queue = self.queues[target]
+        item = queue.popleft()
+        if queue:
+            self.order.append(target)
+        else:
+            del self.queues[target]
+        return item
+
+    def pump(self):
+        """Sends as many lines as the bucket allows, and schedules the rest"""
+        if self.call is not None:
+            # already waiting on tokens
+            return
+
+        self.refill()
+        while self.tokens >= 1 and (self.server or self.priority or self.order):
+            queued, line = self.next()
+            wait = time() - queued
+            self.totalWait += wait
+            self.maxWait = max(self.maxWait, wait)
+            self.sent += 1
+            self.tokens -= 1
+            self.send(line)
+
+        if self.server or self.priority or self.order:
+            self.call = reactor.callLater((1 - self.tokens) / self.rate, self.wake)
+
+    def wake(self):
+        self.call = None
+        self.pump()
+
+    def stop(self):
+        """Drops everything still queued"""
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+        self.server.clear()
+        self.priority.clear()
+        self.queues.clear()
+        self.order.clear()
+
+def splitText(text, size):
+    """Splits text into chunks of at most size bytes, never inside a UTF-8 sequence"""
+    chunks = []
+    while len(text) > size:
+        cut = size
+        # back off over continuation bytes (10xxxxxx) so a character isn't split
+        while cut > 0 and ord(text[cut]) & 0xC0 == 0x80:
+            cut -= 1
+        if cut == 0:
+            cut = size
+        chunks.append(text[:cut])
+        text = text[cut:]
+    chunks.append(text)
+    return chunks
+
+def packLines(pieces, size, separator=' | '):
+    """Packs pieces of text into as few lines of at most size bytes as possible"""
+    lines = []
+    current = ''
+
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+
+        for chunk in splitText(piece, size):
+            if not current:
+                current = chunk
+            elif len(current) + len(separator) + len(chunk) <= size:
+                current += separator + chunk
+            else:
+                lines.append(current)
+                current = chunk
+
+    if current:
+        lines.append(current)
+    return lines
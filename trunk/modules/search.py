@@ -29,17 +29,43 @@
 
 # system imports
 import socket
+import os
+from time import time
+
+# twisted imports
+from twisted.internet import defer
 
 # SOAP imports
 from SOAPpy import WSDL
 
+# modules
+from workers import WorkerPool
+from cache import LRUCache
+
+_searches = {}
+_wsdl = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'GoogleSearch.wsdl')
+
+def getSearch(proxy=None, key=None, endpoint=None):
+    """Returns the shared GoogleSearch for this proxy and licence key, creating it
+       (and parsing the WSDL) only the first time it is asked for"""
+    if not _searches.has_key((proxy, key, endpoint)):
+        _searches[(proxy, key, endpoint)] = GoogleSearch(proxy, key, endpoint)
+    return _searches[(proxy, key, endpoint)]
+
 class GoogleSearch:
     
-    def __init__(self, proxy=None, key=None):
+    def __init__(self, proxy=None, key=None, endpoint=None, threads=2, cacheSize=200, cacheTTL=3600):
         """Default Constructor"""
         self.key = key
         self.proxy = proxy
-        self.server = WSDL.Proxy('GoogleSearch.wsdl', http_proxy = self.proxy)
+        self.server = WSDL.Proxy(_wsdl, http_proxy = self.proxy)
+        self.workers = WorkerPool(1, threads)
+        self.cache = LRUCache(cacheSize, cacheTTL)
+
+        if endpoint:
+            # talk to another SOAP server (e.g. a local fake one) using the same WSDL
+            for method in self.server.methods.values():
+                method.location = endpoint
 
     def search(self, query, start=0, end=10, filter=False, restrict="", safeSearch=False):
         """Perform google search"""
@@ -50,6 +76,28 @@ class GoogleSearch:
         """Get a spelling suggestion for a word"""
         results = self.server.doSpellingSuggestion(self.key, word)
         return results
+
+    def deferSearch(self, query, start=0, end=10):
+        """search, answered from the cache or run in a worker thread. Returns a Deferred"""
+        return self.cached(('search', query, start, end), self.search, query, start, end)
+
+    def deferSpell(self, word):
+        """spell, answered from the cache or run in a worker thread. Returns a Deferred"""
+        return self.cached(('spell', word), self.spell, word)
+
+    def cached(self, key, f, *args):
+        result = self.cache.get(key)
+        if result is not None:
+            return defer.succeed(result)
+
+        d = self.workers.run(f, *args)
+        d.addCallback(self.store, key)
+        return d
+
+    def store(self, result, key):
+        if result:
+            self.cache.put(key, result)
+        return result
                 
     def setProxy(self, proxy):
         """Set the HTTP proxy that we must use to connect to Google"""
@@ -84,3 +132,115 @@ class GoogleSearchResults:
     def getResultElements(self):
         """Get List of results"""
         return self.results.resultElements
+
+class SearchSession:
+    """
+        One user's search: results are fetched a page at a time and handed
+        out from the buffer, with the next page fetched before it runs out
+    """
+
+    def __init__(self, client, query, pageSize=10, low=5, maxResults=1000):
+        self.client = client
+        self.query = query
+        self.pageSize = pageSize      # results per request (the API's maximum is 10)
+        self.low = low                # prefetch once fewer than this are buffered
+        self.maxResults = maxResults  # the API won't go past this
+        self.buffer = []
+        self.next = 0                 # where the next page starts
+        self.done = False             # no more results to fetch
+        self.searchTime = 0.0
+        self.fetching = False
+        self.waiting = []             # (Deferred, count) for take() calls waiting on a fetch
+        self.touched = time()
+        self.requests = 0
+
+    def take(self, count):
+        """Returns a Deferred firing with up to count results"""
+        self.touched = time()
+        d = defer.Deferred()
+        self.waiting.append((d, count))
+        self.serve()
+        return d
+
+    def putBack(self, results):
+        """Returns results that were taken but not shown to the front of the buffer"""
+        self.buffer[:0] = results
+
+    def serve(self):
+        while self.waiting:
+            d, count = self.waiting[0]
+            if len(self.buffer) < count and not self.done:
+                self.fetch()
+                return
+            self.waiting.pop(0)
+            results = self.buffer[:count]
+            del self.buffer[:count]
+            d.callback(results)
+
+        if len(self.buffer) < self.low and not self.done:
+            # get the next page while the user reads this one
+            self.fetch()
+
+    def fetch(self):
+        if self.fetching:
+            return
+        self.fetching = True
+        self.requests += 1
+        d = self.client.deferSearch(self.query, self.next, self.pageSize)
+        d.addCallbacks(self.fetched, self.failed)
+
+    def fetched(self, result):
+        self.fetching = False
+        if result:
+            results = list(result.getResultElements())
+            self.searchTime = result.getSearchTime()
+        else:
+            results = []
+
+        self.buffer.extend(results)
+        self.next += len(results)
+        if len(results) < self.pageSize or self.next >= self.maxResults:
+            self.done = True
+        self.serve()
+
+    def failed(self, failure):
+        self.fetching = False
+        self.done = True
+        waiting = self.waiting
+        self.waiting = []
+        for d, count in waiting:
+            d.errback(failure)
+
+class SearchSessions:
+    """
+        Search sessions, keyed by whoever started them, expiring after ttl seconds unused
+    """
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self.sessions = {}
+        self.requests = 0   # backend requests made by expired sessions
+        self.pages = 0      # pages of results handed out
+
+    def start(self, key, client, query):
+        self.expire()
+        session = SearchSession(client, query)
+        self.sessions[key] = session
+        return session
+
+    def get(self, key):
+        self.expire()
+        return self.sessions.get(key)
+
+    def expire(self):
+        now = time()
+        for key, session in self.sessions.items():
+            if now - session.touched > self.ttl and not session.fetching:
+                self.requests += session.requests
+                del self.sessions[key]
+
+    def totalRequests(self):
+        total = self.requests
+        for session in self.sessions.itervalues():
+            total += session.requests
+        return total
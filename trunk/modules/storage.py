@@ -0,0 +1,90 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# system imports
+import os
+
+class Storage:
+    """
+        Where the bot keeps its files. Everything lives under one base
+        directory and is addressed by absolute path, so nothing depends on
+        (or changes) the working directory, and storage calls are safe
+        from worker threads
+    """
+
+    def __init__(self, base='.'):
+        self.base = os.path.abspath(base)
+
+    def init(self, *directories):
+        """Creates the base directory and the given subdirectories. Call once at startup"""
+        for directory in ('',) + directories:
+            path = self.path(directory)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+    def path(self, *parts):
+        """Returns the absolute path of parts, relative to the base directory"""
+        return os.path.join(self.base, *parts)
+
+    def atomicWrite(self, path, data):
+        """Replaces the file at path with data, so readers see the old or new file, never half of one"""
+        f = AtomicFile(path)
+        try:
+            f.write(data)
+        except:
+            f.abort()
+            raise
+        f.commit()
+
+class AtomicFile:
+    """
+        A file written under a temporary name and renamed over the real one
+        by commit(), once everything has been written and synced
+    """
+
+    def __init__(self, path, mode='w'):
+        self.path = path
+        self.temp = '%s.tmp%d' % (path, os.getpid())
+        self.file = open(self.temp, mode)
+
+    def write(self, data):
+        self.file.write(data)
+
+    def commit(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if os.name == 'nt' and os.path.exists(self.path):
+            # rename won't replace an existing file on Windows
+            os.remove(self.path)
+        os.rename(self.temp, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.temp)
@@ -28,54 +28,292 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 # system imports
-from time import asctime, localtime
+from time import asctime, localtime, time
+import threading
+import shelve
+import md5
+import os
 
 #pysvn imports
 from pysvn import Client, Revision, opt_revision_kind, ClientError
 
+# modules
+from workers import WorkerPool
+
 class SVNInterface: #XXX: for Testing pysvn, add new features as desired
         """
             Provides an interface to SVN repositories
         """
 
-        def __init__(self, repo):
+        def __init__(self, repo, threads=2, cacheFile=None, headTTL=30):
             self.repo = repo
-            self.client = Client()
+            self.local = threading.local()  # pysvn clients are not thread safe, keep one per thread
+            self.workers = WorkerPool(1, threads)
+            self.head = -1          # last known HEAD revision
+            self.headTime = 0       # when we learnt it
+            self.headTTL = headTTL  # how long (seconds) lastLog may trust it
+
+            if cacheFile:
+                self.cache = SVNLogCache(cacheFile)
+            else:
+                self.cache = None
+
+        def getClient(self):
+            """Returns the pysvn client belonging to the calling thread"""
+            client = getattr(self.local, 'client', None)
+            if client is None:
+                client = self.local.client = Client()
+            return client
+
+        def close(self):
+            """Closes the cache now (requests under way carry on without it), and stops
+               the worker threads once they are done"""
+            if self.cache is not None:
+                self.cache.close()
+            self.workers.whenIdle(self.workers.stop)
+
+        def deferLastRev(self):
+            """lastRev, run in a worker thread. Returns a Deferred"""
+            return self.workers.run(self.lastRev)
+
+        def deferLastLog(self, num=1, files=False):
+            """lastLog, run in a worker thread. Returns a Deferred"""
+            return self.workers.run(self.lastLog, num, files)
+
+        def deferLogSince(self, rev, files=False, end=None):
+            """logSince, run in a worker thread. Returns a Deferred"""
+            return self.workers.run(self.logSince, rev, files, end)
+
+        def streamLog(self, callback, start, end, files=False):
+            """iterLog, run in a worker thread. callback gets each entry on the reactor thread.
+               Returns a Deferred that fires when all entries have been sent"""
+            return self.workers.stream(callback, self.iterLog, start, end, files)
+
+        def fetch(self, start, end, files=False, limit=0):
+            """Fetches and converts the log entries from start to end (at most limit). May raise ClientError"""
+            log = self.getClient().log(self.repo, revision_start=start, revision_end=end,
+                                       discover_changed_paths=files, limit=limit)
+            log = [convertEntry(entry, files) for entry in log]
+
+            for entry in log:
+                if int(entry['revision']) > self.head:
+                    self.head = int(entry['revision'])
+            if start.kind == opt_revision_kind.head or end.kind == opt_revision_kind.head:
+                self.headTime = time()
+
+            return log
 
         def lastRev(self):
-            ret = self.lastLog()
-            if ret == 'Error connecting to SVN repo':
+            """Returns the latest revision (an int, -1 on error), asking the server every time"""
+            head = Revision(opt_revision_kind.head)
+            first = Revision(opt_revision_kind.number, 0)
+
+            try:
+                # newest entry for our path, which need not be the repository HEAD
+                log = self.fetch(head, first, True, 1)
+            except ClientError, message:
+                msg = 'Error connecting to SVN repo: %s' % (message, )
+                print msg
                 return -1
-            else:
-                return ret[0]['revision']
-                
+
+            if not log:
+                return -1
+
+            if self.cache is not None:
+                self.cache.store(log)
+
+            return int(log[0]['revision'])
+
         def lastLog(self, num=1, files=False):
-            
-            if num == 1:
+            """Returns the last num log entries, newest first. Only revisions the cache
+               hasn't seen are fetched from the server"""
+            if self.cache is not None and self.head > 0 and time() - self.headTime >= self.headTTL:
+                # HEAD may have moved since we last heard: ask for just the newest entry,
+                # then for the revisions after the ones we know, if there are only a few
+                known = self.head
+                head = self.lastRev()
+                if head > known and head - known <= num:
+                    self.logSince(known, True)
+
+            if self.cache is not None and self.head > 0 and time() - self.headTime < self.headTTL:
+                # HEAD is known, so serve what we can from the cache
+                log, rev = self.cache.walk(self.head, num)
+            else:
+                log, rev = [], None
+
+            if len(log) < num and rev != 0:
+                # rev is the first revision not in the cache (None means start at HEAD)
+                if rev is None:
+                    start = Revision(opt_revision_kind.head)
+                else:
+                    start = Revision(opt_revision_kind.number, rev)
+                end = Revision(opt_revision_kind.number, 0)
+
+                try:
+                    fetched = self.fetch(start, end, files or self.cache is not None, num - len(log))
+                except ClientError, message:
+                    msg = 'Error connecting to SVN repo: %s' % (message, )
+                    print msg
+                    return 'Error connecting to SVN repo'
+
+                if self.cache is not None and fetched:
+                    # every revision between rev and the oldest entry returned didn't touch our path
+                    top = rev or int(fetched[0]['revision'])
+                    self.cache.store(fetched, range(top, int(fetched[-1]['revision']), -1))
+                    self.cache.misses += len(fetched)
+
+                log.extend(fetched)
+
+            if not files:
+                for entry in log:
+                    entry['files'] = []
+
+            return log
+
+        def iterLog(self, start, end, files=False, chunk=50):
+            """Yields the log entries from revision start to end (either direction),
+               fetching them chunk at a time rather than all at once. May raise ClientError"""
+            start, end = int(start), int(end)
+            step = start <= end and 1 or -1
+
+            while (end - start) * step >= 0:
+                log = self.fetch(Revision(opt_revision_kind.number, start),
+                                 Revision(opt_revision_kind.number, end), files, chunk)
+                for entry in log:
+                    yield entry
+
+                if len(log) < chunk:
+                    return
+                start = int(log[-1]['revision']) + step
+
+        def logSince(self, rev, files=False, end=None):
+            """Returns all log entries newer than rev, up to end (default HEAD), oldest first,
+               using a single log call"""
+            start = Revision(opt_revision_kind.number, int(rev))
+            if end is None:
+                last = None
                 end = Revision(opt_revision_kind.head)
             else:
-                end = Revision(opt_revision_kind.number, int(self.lastRev()) - (num - 1))
+                last = int(end)
+                end = Revision(opt_revision_kind.number, last)
 
             try:
-                log = self.client.log(self.repo, revision_end=end, discover_changed_paths=files)
+                log = self.fetch(start, end, files)
             except ClientError, message:
                 msg = 'Error connecting to SVN repo: %s' % (message, )
                 print msg
                 return 'Error connecting to SVN repo'
 
-            for entry in log:
-                entry['date'] = asctime(localtime(entry['date']))      # convert EPOCH seconds to human readable
-                entry['revision'] = str(entry['revision'].number)      # str -> converts int -> string
-                entry['author'] = str(entry['author'])                 # str -> converts unicode -> ascii
-                entry['message'] = str(entry['message'])               # str -> converts unicode -> ascii
-                       
-                if files:
-                    files = []
-                    for file in entry['changed_paths']:
-                        filename = str(file['path'])
-                        mode = str(file['action'])
-                        files.append('%s (%s)' % (filename, mode))
-
-                entry['files'] = files
-                    
-            return log
+            if self.cache is not None and files:
+                if last is None:
+                    last = self.head
+                self.cache.store(log, range(int(rev) + 1, last + 1))
+
+            # the range is inclusive, so rev itself comes back if it touched our path
+            return [entry for entry in log if int(entry['revision']) > int(rev)]
+
+class SVNLogCache:
+        """
+            Persistent cache of converted log entries, keyed by revision.
+            Committed revisions never change, so entries never expire.
+        """
+
+        def __init__(self, filename):
+            self.db = shelve.open(filename)
+            self.lock = threading.Lock()   # used from the SVN worker threads
+            self.hits = 0
+            self.misses = 0
+
+        def walk(self, rev, num):
+            """Collects up to num entries going down from rev. Returns the entries and
+               the revision the walk stopped at (0 once the whole history has been seen)"""
+            log = []
+            self.lock.acquire()
+            try:
+                while self.db is not None and rev > 0 and len(log) < num:
+                    if not self.db.has_key(str(rev)):
+                        break
+                    entry = self.db[str(rev)]
+                    if entry is not None:
+                        log.append(entry)
+                    rev -= 1
+            finally:
+                self.lock.release()
+
+            self.hits += len(log)
+            return log, rev
+
+        def store(self, log, revs=()):
+            """Stores entries from log. Revisions in revs without an entry are stored as empty"""
+            self.lock.acquire()
+            try:
+                if self.db is None:
+                    # closed
+                    return
+                for rev in revs:
+                    if not self.db.has_key(str(rev)):
+                        self.db[str(rev)] = None
+                for entry in log:
+                    self.db[entry['revision']] = entry
+                self.db.sync()
+            finally:
+                self.lock.release()
+
+        def close(self):
+            self.lock.acquire()
+            try:
+                if self.db is not None:
+                    self.db.close()
+                    self.db = None
+            finally:
+                self.lock.release()
+
+class SVNRepositories:
+        """
+            One SVNInterface (with its own log cache) per repository URL,
+            shared by every network that announces or queries that repository
+        """
+
+        def __init__(self, cacheDir, headTTL=30):
+            self.cacheDir = cacheDir    # absolute, see Storage
+            self.headTTL = headTTL
+            self.repos = {}             # url -> SVNInterface
+            self.users = {}             # url -> number of gets not yet released
+
+        def get(self, repo):
+            """Returns the SVNInterface for repo, creating it the first time.
+               Call release when done with it"""
+            if not self.repos.has_key(repo):
+                cacheFile = os.path.join(self.cacheDir, 'svnlog-%s' % md5.new(repo).hexdigest()[:12])
+                self.repos[repo] = SVNInterface(repo, cacheFile=cacheFile, headTTL=self.headTTL)
+            self.users[repo] = self.users.get(repo, 0) + 1
+            return self.repos[repo]
+
+        def release(self, repo):
+            """The caller of get is done with repo, closing its interface if nobody else uses it"""
+            self.users[repo] -= 1
+            if self.users[repo] <= 0:
+                del self.users[repo]
+                self.repos.pop(repo).close()
+
+        def close(self):
+            for svn in self.repos.values():
+                svn.cache.close()
+
+def convertEntry(entry, files=False):
+    """Converts a pysvn log entry to a plain dictionary of strings"""
+    converted = {
+        'date': asctime(localtime(entry['date'])),      # convert EPOCH seconds to human readable
+        'revision': str(entry['revision'].number),      # str -> converts int -> string
+        'author': str(entry['author']),                 # str -> converts unicode -> ascii
+        'message': str(entry['message']),               # str -> converts unicode -> ascii
+        'files': [],
+    }
+
+    if files:
+        for file in entry['changed_paths']:
+            filename = str(file['path'])
+            mode = str(file['action'])
+            converted['files'].append('%s (%s)' % (filename, mode))
+
+    return converted
@@ -0,0 +1,72 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# system imports
+import re
+import string
+import unicodedata
+
+# translation tables, built once
+_identity = string.maketrans('', '')
+_nonPrintable = ''.join([chr(i) for i in range(256) if chr(i) not in string.printable])
+_formatting = '\x02\x0f\x16\x1d\x1f'    # bold, plain, reverse, italic, underline
+_control = ''.join([chr(i) for i in range(32) if chr(i) not in _formatting + '\x03\t']) + '\x7f'
+_color = re.compile('\x03(?:[0-9]{1,2}(?:,[0-9]{1,2})?)?')
+
+_unicodeControl = dict([(ord(c), None) for c in _control])
+_unicodeFormatting = dict([(ord(c), None) for c in _formatting])
+
+def toAscii(text):
+    """Removes all non-ascii (and non printable) characters. Unicode is folded
+       to its closest ascii letters first, so 'e acute' becomes 'e'"""
+    if isinstance(text, unicode):
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore')
+    return text.translate(_identity, _nonPrintable)
+
+def stripFormatting(text):
+    """Removes IRC bold, underline, reverse, italic and colour codes"""
+    if '\x03' in text:
+        text = _color.sub('', text)
+    if isinstance(text, unicode):
+        return text.translate(_unicodeFormatting)
+    return text.translate(_identity, _formatting)
+
+def stripControl(text):
+    """Removes control characters, leaving tabs and IRC formatting codes alone"""
+    if isinstance(text, unicode):
+        return text.translate(_unicodeControl)
+    return text.translate(_identity, _control)
+
+def sanitize(text, ascii=False):
+    """Returns text fit for logging or sending on: no control or formatting codes.
+       UTF-8 (or unicode) passes through unless ascii is set"""
+    text = stripControl(stripFormatting(text))
+    if ascii:
+        text = toAscii(text)
+    return text
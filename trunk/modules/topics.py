@@ -0,0 +1,182 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# twisted imports
+from twisted.internet import reactor
+
+# system imports
+from collections import deque
+import marshal
+
+# modules
+from storage import AtomicFile
+
+def splitTopic(topic):
+    """Splits a topic into its ' | ' separated segments, as a tuple of interned strings"""
+    segments = [segment.strip() for segment in topic.split('|')]
+    if type(topic) is str:
+        # unchanged segments are shared between every topic that has them
+        return tuple([intern(segment) for segment in segments if segment])
+    return tuple([segment for segment in segments if segment])
+
+def joinTopic(segments):
+    return ' | '.join(segments)
+
+class TopicHistory:
+    """
+        Current topic plus undo and redo history for each channel. Topics
+        are tuples of interned segments, histories are deques holding at
+        most maxUndo topics, and everything is saved to one file so the
+        history survives a restart
+    """
+
+    def __init__(self, filename, maxUndo=10, saveDelay=5.0):
+        self.filename = filename    # absolute, see Storage
+        self.maxUndo = maxUndo
+        self.saveDelay = saveDelay  # seconds to gather changes before saving
+        self.topics = {}            # channel -> segments
+        self.undos = {}             # channel -> deque of segments, newest last
+        self.redos = {}
+        self.pending = {}           # channel -> 'undo' or 'redo' we asked the server for
+        self.call = None
+
+    def current(self, channel):
+        return self.topics.get(channel, ())
+
+    def canUndo(self, channel):
+        return len(self.undos.get(channel, ())) > 0
+
+    def canRedo(self, channel):
+        return len(self.redos.get(channel, ())) > 0
+
+    def push(self, history, channel, segments):
+        """Appends segments to the channel's deque in history, dropping the oldest past maxUndo"""
+        try:
+            queue = history[channel]
+        except KeyError:
+            queue = history[channel] = deque()
+
+        if len(queue) > 0 and queue[-1] == segments:
+            return
+        queue.append(segments)
+        while len(queue) > self.maxUndo:
+            queue.popleft()
+
+    def undo(self, channel):
+        """Returns the topic to set to undo the last change, or None if there is none"""
+        if not self.canUndo(channel):
+            return None
+        segments = self.undos[channel].pop()
+        self.push(self.redos, channel, self.current(channel))
+        self.pending[channel] = 'undo'
+        self.schedule()
+        return joinTopic(segments)
+
+    def redo(self, channel):
+        """Returns the topic to set to redo the last undone change, or None if there is none"""
+        if not self.canRedo(channel):
+            return None
+        segments = self.redos[channel].pop()
+        self.pending[channel] = 'redo'
+        self.schedule()
+        return joinTopic(segments)
+
+    def updated(self, channel, topic):
+        """Records topic as the channel's topic, the old one goes on the undo history.
+           A change we didn't make ourselves by undo or redo clears the redo history"""
+        segments = splitTopic(topic)
+        previous = self.topics.get(channel)
+        reason = self.pending.pop(channel, None)
+
+        if previous is not None and reason != 'undo' and previous != segments:
+            self.push(self.undos, channel, previous)
+            if reason is None and self.redos.has_key(channel):
+                del self.redos[channel]
+
+        self.topics[channel] = segments
+        self.schedule()
+
+    def lost(self):
+        """The connection has gone, so any undo or redo we asked for won't happen"""
+        self.pending.clear()
+        self.stop()
+
+    def load(self):
+        """Reads the saved history. A missing or damaged file starts an empty one"""
+        self.topics.clear()
+        self.undos.clear()
+        self.redos.clear()
+        try:
+            f = open(self.filename, 'rb')
+        except IOError:
+            return
+        try:
+            try:
+                data = marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                return
+        finally:
+            f.close()
+
+        for channel, (topic, undos, redos) in data.items():
+            self.topics[channel] = splitTopic(joinTopic(topic))
+            for segments in undos:
+                self.push(self.undos, channel, splitTopic(joinTopic(segments)))
+            for segments in redos:
+                self.push(self.redos, channel, splitTopic(joinTopic(segments)))
+
+    def schedule(self):
+        if self.call is None:
+            self.call = reactor.callLater(self.saveDelay, self.save)
+
+    def save(self):
+        """Writes every channel's topic and history to the file"""
+        if self.call is not None:
+            if self.call.active():
+                self.call.cancel()
+            self.call = None
+
+        data = {}
+        for channel in self.topics.keys() + self.undos.keys() + self.redos.keys():
+            if not data.has_key(channel):
+                data[channel] = (self.topics.get(channel, ()),
+                                 list(self.undos.get(channel, ())),
+                                 list(self.redos.get(channel, ())))
+
+        f = AtomicFile(self.filename, 'wb')
+        try:
+            marshal.dump(data, f.file)
+        except:
+            f.abort()
+            raise
+        f.commit()
+
+    def stop(self):
+        """Saves any unsaved changes"""
+        if self.call is not None:
+            self.save()
@@ -29,6 +29,10 @@
 
 import sgmllib
 import htmlentitydefs
+import re
+
+# modules
+from cache import LRUCache
 
 class HtmlToText(sgmllib.SGMLParser):
     """Taken from supybot (who took it from somewhere else...)"""
@@ -53,12 +57,55 @@ class HtmlToText(sgmllib.SGMLParser):
         text = ''.join(self.data).strip()
         return normalizeWhitespace(text)
 
+_htmlToken = re.compile(r'<!--.*?-->|<[/!?]?[a-zA-Z][^>]*>|&(#[0-9]+|#[xX][0-9a-fA-F]+|[a-zA-Z][a-zA-Z0-9]*);', re.S)
+_htmlCache = LRUCache(512)
+
+def _entity(name, text):
+    """Returns the character for an entity name (without & and ;), or None"""
+    if name[0] == '#':
+        try:
+            if name[1] in 'xX':
+                code = int(name[2:], 16)
+            else:
+                code = int(name[1:])
+        except ValueError:
+            return None
+    elif name == 'nbsp':
+        return ' '
+    else:
+        code = htmlentitydefs.name2codepoint.get(name)
+        if code is None:
+            return None
+
+    try:
+        char = unichr(code)
+    except (ValueError, OverflowError):
+        return None
+
+    if isinstance(text, unicode):
+        return char
+    return char.encode('utf-8')     # byte strings are taken to be UTF-8
+
 def htmlToText(s, tagReplace=' '):
-    """Turns HTML into text.  tagReplace is a string to replace HTML tags with. (Taken from supybot)"""
-    
-    x = HtmlToText(tagReplace)
-    x.feed(s)
-    return x.getText()
+    """Turns HTML into text.  tagReplace is a string to replace HTML tags with.
+       Tags and entities are handled in one regexp pass, recent results are cached"""
+    key = (s, tagReplace)
+    text = _htmlCache.get(key)
+    if text is not None:
+        return text
+
+    def replace(match):
+        name = match.group(1)
+        if name is None:
+            return tagReplace
+        char = _entity(name, s)
+        if char is None:
+            return match.group(0)
+        return char
+
+    text = normalizeWhitespace(_htmlToken.sub(replace, s))
+    _htmlCache.put(key, text)
+    return text
 
 def normalizeWhitespace(s):
     """Normalizes the whitespace in a string; \s+ becomes one space. (taken from supybot)"""
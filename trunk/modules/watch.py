@@ -0,0 +1,190 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# twisted imports
+from twisted.internet import reactor
+
+# system imports
+import os
+
+# modules
+from storage import AtomicFile
+
+class WatchStore:
+    """
+        Quit message counters for watched users. Each counted quit is
+        appended to a journal (synced in batches), and the journal is
+        compacted into a snapshot every so often. The snapshot and the
+        journal both carry a generation number, a journal older than the
+        snapshot is already counted in it and is not replayed
+    """
+
+    def __init__(self, directory, compactEvery=500, syncDelay=5.0):
+        self.directory = directory        # absolute, see Storage
+        self.compactEvery = compactEvery  # journal entries before compacting
+        self.syncDelay = syncDelay        # seconds to gather entries before syncing
+        self.data = {}                    # user -> {quit message: count}
+        self.pending = []                 # journal lines not yet written
+        self.entries = 0                  # entries in the journal file
+        self.generation = 0               # snapshots written, 0 for older files
+        self.journal = None
+        self.call = None
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def load(self, users):
+        """Reads the snapshot and replays the journal. users are the watched users"""
+        self.data.clear()
+        for user in users:
+            self.data[user] = {}
+
+        self.generation = 0
+        try:
+            f = open(self.path('watch.snapshot'), 'r')
+        except IOError:
+            self.loadOldFiles(users)
+        else:
+            try:
+                for line in f:
+                    if line.startswith('# generation '):
+                        self.generation = int(line.split()[2])
+                    elif line.endswith('\n'):
+                        user, count, message = line[:-1].split('\t', 2)
+                        self.data.setdefault(user, {})[message] = int(count)
+            finally:
+                f.close()
+
+        self.entries = 0
+        try:
+            f = open(self.path('watch.journal'), 'r')
+        except IOError:
+            return
+        try:
+            generation = 0
+            for line in f:
+                if line.startswith('# generation '):
+                    generation = int(line.split()[2])
+                    # left behind by a crash in compact, the snapshot has it all
+                    if generation < self.generation:
+                        break
+                # a line without its newline was cut short by a crash, skip it
+                elif line.endswith('\n') and '\t' in line:
+                    user, message = line[:-1].split('\t', 1)
+                    self.count(user, message)
+                    self.entries += 1
+        finally:
+            f.close()
+
+        if generation < self.generation:
+            self.startJournal()
+
+    def loadOldFiles(self, users):
+        """Reads the per-user .watch files written by older versions"""
+        for user in users:
+            try:
+                f = open(self.path(user + '.watch'), 'r')
+            except IOError:
+                continue
+            try:
+                for line in f:
+                    for entry in line.split('\n'):
+                        if '<*!*>' in entry:
+                            message, count = entry.split('<*!*>')
+                            self.data[user][message.strip()] = int(count)
+            finally:
+                f.close()
+
+    def count(self, user, message):
+        messages = self.data.setdefault(user, {})
+        messages[message] = messages.get(message, 0) + 1
+
+    def record(self, user, message):
+        """Counts a quit by user with message, and journals it"""
+        user, message = user.lower(), message.lower().replace('\n', ' ')
+        self.count(user, message)
+        self.pending.append('%s\t%s\n' % (user, message))
+        if self.call is None:
+            self.call = reactor.callLater(self.syncDelay, self.sync)
+
+    def sync(self):
+        """Writes the pending journal entries and syncs them to disk"""
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+
+        if not self.pending:
+            return
+
+        if self.journal is None:
+            self.journal = open(self.path('watch.journal'), 'a')
+            self.journal.seek(0, 2)
+            if self.journal.tell() == 0:
+                self.pending.insert(0, '# generation %d\n' % self.generation)
+        self.journal.write(''.join(self.pending))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.entries += len(self.pending)
+        self.pending = []
+
+        if self.entries >= self.compactEvery:
+            self.compact()
+
+    def compact(self):
+        """Writes all counters to the snapshot and starts a new journal"""
+        self.sync()
+
+        # written aside and renamed into place, a crash leaves the old snapshot whole
+        f = AtomicFile(self.path('watch.snapshot'))
+        try:
+            f.write('# generation %d\n' % (self.generation + 1))
+            for user, messages in self.data.iteritems():
+                for message, count in messages.iteritems():
+                    f.write('%s\t%d\t%s\n' % (user, count, message))
+        except:
+            f.abort()
+            raise
+        f.commit()
+        self.generation += 1
+        self.startJournal()
+
+    def startJournal(self):
+        """Empties the journal, marking it as following the current snapshot"""
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.path('watch.journal'), 'w')
+        self.journal.write('# generation %d\n' % self.generation)
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.entries = 0
+
+    def close(self):
+        self.compact()
+        self.journal.close()
+        self.journal = None
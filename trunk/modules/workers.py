@@ -0,0 +1,105 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# twisted imports
+from twisted.internet import reactor, defer
+from twisted.python import threadpool, failure
+
+class WorkerPool:
+    """
+        A bounded pool of worker threads for blocking calls (SVN, SOAP, ...),
+        whose results are handed back to the reactor thread as Deferreds
+    """
+
+    def __init__(self, minThreads=1, maxThreads=2):
+        self.minThreads = minThreads
+        self.maxThreads = maxThreads
+        self.pool = None
+        self.pending = 0
+        self.idle = []      # called once no job is pending
+
+    def start(self):
+        """Start the worker threads, if not already running"""
+        if self.pool is None:
+            self.pool = threadpool.ThreadPool(self.minThreads, self.maxThreads)
+            self.pool.start()
+            reactor.addSystemEventTrigger('during', 'shutdown', self.stop)
+
+    def stop(self):
+        """Stop the worker threads, waiting for running jobs to finish"""
+        if self.pool is not None:
+            pool = self.pool
+            self.pool = None
+            pool.stop()
+
+    def run(self, f, *args, **kwargs):
+        """Call f(*args, **kwargs) in a worker thread, returns a Deferred"""
+        self.start()
+        self.pending += 1
+        d = defer.Deferred()
+        d.addBoth(self._done)
+        self.pool.callInThread(_runJob, d, f, args, kwargs)
+        return d
+
+    def stream(self, callback, f, *args, **kwargs):
+        """Iterate over f(*args, **kwargs) in a worker thread, handing each item to
+           callback on the reactor thread. Returns a Deferred fired once it is exhausted"""
+        return self.run(_streamJob, callback, f, args, kwargs)
+
+    def whenIdle(self, f):
+        """Calls f once the jobs already queued are done (straight away if there are none)"""
+        if self.pending:
+            self.idle.append(f)
+        else:
+            f()
+
+    def _done(self, result):
+        self.pending -= 1
+        if not self.pending:
+            idle, self.idle = self.idle, []
+            for f in idle:
+                f()
+        return result
+
+def _runJob(d, f, args, kwargs):
+    """Runs in the worker thread, fires d back on the reactor thread"""
+    try:
+        result = f(*args, **kwargs)
+    except:
+        reactor.callFromThread(d.errback, failure.Failure())
+    else:
+        reactor.callFromThread(d.callback, result)
+
+def _streamJob(callback, f, args, kwargs):
+    """Runs in the worker thread, passes items back one at a time"""
+    count = 0
+    for item in f(*args, **kwargs):
+        reactor.callFromThread(callback, item)
+        count += 1
+    return count
@@ -0,0 +1,92 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Tests for modules.auth, run from the trunk directory:
+
+    Usage: python tests/test_auth.py
+"""
+
+# system imports
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# twisted imports
+from twisted.internet import task
+
+# modules
+from modules import auth
+
+class RenameTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        auth.reactor = self.clock
+        auth.time = self.clock.seconds
+        self.lines = []
+        self.manager = auth.AuthManager(self.lines.append)
+
+    def loginAs(self, nick):
+        self.manager.request(nick)
+        self.clock.advance(self.manager.delay)
+        self.manager.identify(nick)
+        self.manager.endOfWhois(nick)
+        del self.lines[:]
+
+    def testAuthorisedNewNickIsRequested(self):
+        self.loginAs('Admin')
+        self.manager.renamed('Admin', 'Admin_away', True)
+        self.failIf('admin' in self.manager.loggedIn)
+        self.clock.advance(self.manager.delay)
+        self.assertEquals(self.lines, ['WHOIS admin_away'])
+
+        self.manager.identify('Admin_away')
+        self.manager.endOfWhois('Admin_away')
+        self.failUnless('admin_away' in self.manager.loggedIn)
+
+    def testUnauthorisedNewNickIsNot(self):
+        self.loginAs('Admin')
+        self.manager.renamed('Admin', 'Someone', False)
+        self.clock.advance(self.manager.delay)
+        self.assertEquals(self.lines, [])
+        self.failIf(self.manager.loggedIn)
+
+    def testOldIdentificationIsNotTrusted(self):
+        # renaming back must not log in on the identification of the old nick
+        self.loginAs('Admin')
+        self.manager.renamed('Admin', 'Other', False)
+        self.manager.renamed('Other', 'Admin', True)
+        self.failIf('admin' in self.manager.loggedIn)
+        self.clock.advance(self.manager.delay)
+        self.assertEquals(self.lines, ['WHOIS admin'])
+
+if __name__ == '__main__':
+    unittest.main()
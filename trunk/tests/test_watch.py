@@ -0,0 +1,119 @@
+# Copyright (c) 2005, Marcel van Rensburg and Neil Rutherford.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  3. Neither the names of the copyright holders nor the names of the
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNERS OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+    Tests for modules.watch, run from the trunk directory:
+
+    Usage: python tests/test_watch.py
+"""
+
+# system imports
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# twisted imports
+from twisted.internet import task
+
+# modules
+from modules import watch
+
+class CompactTest(unittest.TestCase):
+
+    def setUp(self):
+        watch.reactor = task.Clock()
+        self.directory = tempfile.mkdtemp()
+        self.store = self.open()
+
+    def tearDown(self):
+        if self.store.journal is not None:
+            self.store.journal.close()
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        store = watch.WatchStore(self.directory)
+        store.load(['someone'])
+        return store
+
+    def reopen(self):
+        if self.store.journal is not None:
+            self.store.journal.close()
+            self.store.journal = None
+        self.store = self.open()
+
+    def quits(self, count):
+        for i in range(count):
+            self.store.record('Someone', 'Ping timeout')
+
+    def testJournalIsReplayed(self):
+        self.quits(3)
+        self.store.sync()
+        self.reopen()
+        self.assertEquals(self.store.data['someone'], {'ping timeout': 3})
+
+    def testCrashBeforeJournalIsEmptied(self):
+        self.quits(3)
+        self.store.compact()
+        self.quits(2)
+        self.store.sync()
+
+        # crash in compact after the snapshot is committed, before the
+        # journal it now contains is emptied
+        def crash():
+            raise IOError('crashed')
+        old = open(self.store.path('watch.journal')).read()
+        self.store.startJournal = crash
+        self.assertRaises(IOError, self.store.compact)
+        self.assertEquals(open(self.store.path('watch.journal')).read(), old)
+
+        self.reopen()
+        self.assertEquals(self.store.data['someone'], {'ping timeout': 5})
+
+        # the stale journal is emptied, so later quits are not lost
+        self.quits(1)
+        self.store.sync()
+        self.reopen()
+        self.assertEquals(self.store.data['someone'], {'ping timeout': 6})
+
+    def testFilesWithoutGeneration(self):
+        # as written by the first WatchStore, before generations
+        f = open(self.store.path('watch.snapshot'), 'w')
+        f.write('someone\t4\tping timeout\n')
+        f.close()
+        f = open(self.store.path('watch.journal'), 'w')
+        f.write('someone\tping timeout\n')
+        f.close()
+        self.reopen()
+        self.assertEquals(self.store.data['someone'], {'ping timeout': 5})
+
+if __name__ == '__main__':
+    unittest.main()